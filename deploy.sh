@@ -338,24 +338,14 @@ EOF
 configure_supervisor() {
     log_info "配置 Supervisor..."
     
-    # 检查主应用文件
+    # 使用 gunicorn 多进程启动（进程数、线程数等见 gunicorn.conf.py，可用环境变量覆盖）
     cd /opt/point-rewards/point-rewards-backend
-    main_files=("run.py" "app.py" "main.py")
-    main_file="run.py"  # 默认使用run.py
-    
-    for file in "${main_files[@]}"; do
-        if [ -f "$file" ]; then
-            main_file="$file"
-            break
-        fi
-    done
-    
-    log_info "使用主应用文件: $main_file"
+    log_info "使用 gunicorn 启动: wsgi:app"
     
     # 创建优化的Supervisor配置
     cat > /etc/supervisor/conf.d/point-rewards-backend.conf << EOF
 [program:point-rewards-backend]
-command=/opt/point-rewards/point-rewards-backend/venv/bin/python $main_file
+command=/opt/point-rewards/point-rewards-backend/venv/bin/gunicorn -c gunicorn.conf.py wsgi:app
 directory=/opt/point-rewards/point-rewards-backend
 user=www-data
 autostart=true
@@ -605,6 +595,12 @@ server {
         proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
+
+    # 后端设置 UPLOAD_SENDFILE=x-accel 时，上传文件校验后由 nginx 直接发送
+    location /_uploads/ {
+        internal;
+        alias /opt/point-rewards/point-rewards-backend/static/uploads/;
+    }
 }
 
 # 管理后台 - $ADMIN_DOMAIN
@@ -664,6 +660,12 @@ server {
         proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
+
+    # 后端设置 UPLOAD_SENDFILE=x-accel 时，上传文件校验后由 nginx 直接发送
+    location /_uploads/ {
+        internal;
+        alias /opt/point-rewards/point-rewards-backend/static/uploads/;
+    }
 }
 EOF
     
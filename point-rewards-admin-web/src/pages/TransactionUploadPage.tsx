@@ -3,12 +3,25 @@ import { useMutation, useQueryClient } from '@tanstack/react-query'
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card'
 import { Button } from '@/components/ui/button'
 import { Progress } from '@/components/ui/progress'
+import { Input } from '@/components/ui/input'
+import { Label } from '@/components/ui/label'
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from '@/components/ui/select'
 import { apiClient } from '@/lib/api'
 import { useToast } from '@/hooks/use-toast'
-import { Upload, FileSpreadsheet, CheckCircle, AlertTriangle, X, Download } from 'lucide-react'
+import { Upload, FileSpreadsheet, CheckCircle, AlertTriangle, X, Download, Eye } from 'lucide-react'
+
+type ImportMode = 'overwrite' | 'delta'
 
 interface UploadResult {
+  mode: ImportMode
   updated_count: number
+  changed_count: number
   not_found_count: number
   total_processed: number
   error_records: Array<{
@@ -18,57 +31,151 @@ interface UploadResult {
   }>
 }
 
+interface ImportJob {
+  job_id: string
+  status: 'pending' | 'running' | 'completed' | 'failed'
+  total_processed: number
+  updated_count: number
+  changed_count: number
+  not_found_count: number
+  message: string | null
+}
+
+interface PreviewItem {
+  row: number
+  kuaishou_id: string
+  nickname: string | null
+  old_points: string | null
+  new_points: string | null
+  delta: string | null
+}
+
+interface PreviewResult {
+  mode: ImportMode
+  summary: {
+    total_count: number
+    matched_count: number
+    unknown_count: number
+    changed_count: number
+    unchanged_count: number
+    negative_count: number
+    negative_balance_count: number
+    points_increase: string
+    points_decrease: string
+  }
+  items: PreviewItem[]
+  next_cursor: string | null
+}
+
+const POLL_INTERVAL = 1000
+const PREVIEW_PAGE_SIZE = 20
+
+// 与后端 TRANSACTION_FILE_EXTENSIONS 保持一致
+const ACCEPTED_EXTENSIONS = ['.xlsx', '.xls', '.csv', '.parquet', '.arrow', '.feather']
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
 export default function TransactionUploadPage() {
   const [selectedFile, setSelectedFile] = useState<File | null>(null)
   const [uploadResult, setUploadResult] = useState<UploadResult | null>(null)
   const [isDragOver, setIsDragOver] = useState(false)
   const [showAllErrors, setShowAllErrors] = useState(false)
+  const [jobProgress, setJobProgress] = useState<ImportJob | null>(null)
+  const [importMode, setImportMode] = useState<ImportMode>('overwrite')
+  const [period, setPeriod] = useState('')
+  const [preview, setPreview] = useState<{ jobId: string, result: PreviewResult } | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const fileInputRef = useRef<HTMLInputElement>(null)
   const { toast } = useToast()
   const queryClient = useQueryClient()
 
   const uploadMutation = useMutation({
-    mutationFn: (file: File) => {
+    mutationFn: async ({ file, dryRun }: { file: File, dryRun: boolean }) => {
       const formData = new FormData()
       formData.append('file', file)
-      return apiClient.post('/api/admin/upload-transaction', formData, {
+      formData.append('mode', importMode)
+      if (dryRun) {
+        formData.append('dry_run', 'true')
+      }
+      if (importMode === 'delta') {
+        formData.append('period', period.trim())
+      }
+      const submitted = await apiClient.post<{ job_id: string, reused: boolean }>('/api/admin/upload-transaction', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         }
       })
+      const jobId = submitted.data.job_id
+      if (submitted.data.reused) {
+        toast({
+          title: '重复上传',
+          description: '该文件已上传过，直接显示上次的处理结果'
+        })
+      }
+
+      // 轮询后台任务进度，直到完成或失败
+      while (true) {
+        await sleep(POLL_INTERVAL)
+        const job = (await apiClient.get<ImportJob>(`/api/admin/import-jobs/${jobId}`)).data
+        setJobProgress(job)
+        if (job.status === 'failed') {
+          throw new Error(job.message || '处理文件时出现错误')
+        }
+        if (job.status === 'completed') {
+          if (dryRun) {
+            const previewResponse = await apiClient.get<PreviewResult>(
+              `/api/admin/import-jobs/${jobId}/preview`, { params: { limit: PREVIEW_PAGE_SIZE } }
+            )
+            return { jobId, preview: previewResponse.data as PreviewResult }
+          }
+          return { jobId, response: await apiClient.get<UploadResult>(`/api/admin/import-jobs/${jobId}/errors`) }
+        }
+      }
     },
-    onSuccess: (response) => {
-      const typedData = response.data as UploadResult
+    onSuccess: ({ jobId, preview: previewResult, response }) => {
+      setJobProgress(null)
+      if (previewResult) {
+        // 预览不修改积分，保留已选文件以便确认后正式导入
+        setPreview({ jobId, result: previewResult })
+        setUploadResult(null)
+        return
+      }
+      const typedData = response!.data as UploadResult
+      setPreview(null)
       setUploadResult(typedData)
       setShowAllErrors(false) // 重置展开状态
       toast({
         title: '上传成功',
-        description: `成功更新 ${typedData.updated_count} 个用户的积分信息`
+        description: typedData.mode === 'delta'
+          ? `匹配 ${typedData.updated_count} 行，其中 ${typedData.changed_count} 个用户的积分有变化`
+          : `成功更新 ${typedData.updated_count} 个用户的积分信息`
       })
       // 刷新用户数据
       queryClient.invalidateQueries({ queryKey: ['users'] })
       setSelectedFile(null)
     },
     onError: (error: any) => {
+      setJobProgress(null)
       toast({
         title: '上传失败',
-        description: error.response?.data?.message || '处理文件时出现错误',
+        description: error.response?.data?.message || error.message || '处理文件时出现错误',
         variant: 'destructive'
       })
     }
   })
 
   const handleFileSelect = (file: File) => {
-    if (!file.name.toLowerCase().endsWith('.xlsx') && !file.name.toLowerCase().endsWith('.xls')) {
+    if (!ACCEPTED_EXTENSIONS.some(ext => file.name.toLowerCase().endsWith(ext))) {
       toast({
         title: '文件格式错误',
-        description: '请选择 Excel 文件 (.xlsx 或 .xls)',
+        description: '请选择 Excel (.xlsx/.xls)、CSV 或 Parquet/Arrow 文件',
         variant: 'destructive'
       })
       return
     }
     setSelectedFile(file)
     setUploadResult(null)
+    setPreview(null)
   }
 
   const handleDrop = (e: React.DragEvent) => {
@@ -97,15 +204,47 @@ export default function TransactionUploadPage() {
     }
   }
 
-  const handleUpload = () => {
+  const loadMorePreview = async () => {
+    if (!preview?.result.next_cursor) return
+    setLoadingMore(true)
+    try {
+      const response = await apiClient.get<PreviewResult>(`/api/admin/import-jobs/${preview.jobId}/preview`, {
+        params: { limit: PREVIEW_PAGE_SIZE, cursor: preview.result.next_cursor }
+      })
+      const page = response.data as PreviewResult
+      setPreview({
+        jobId: preview.jobId,
+        result: { ...page, items: [...preview.result.items, ...page.items] }
+      })
+    } catch (error: any) {
+      toast({
+        title: '加载失败',
+        description: error.response?.data?.message || '无法加载更多预览数据',
+        variant: 'destructive'
+      })
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
+  const handleUpload = (dryRun: boolean) => {
+    if (importMode === 'delta' && !period.trim()) {
+      toast({
+        title: '请填写周期',
+        description: '增量导入需要指定周期，例如 2025-W35',
+        variant: 'destructive'
+      })
+      return
+    }
     if (selectedFile) {
-      uploadMutation.mutate(selectedFile)
+      uploadMutation.mutate({ file: selectedFile, dryRun })
     }
   }
 
   const resetUpload = () => {
     setSelectedFile(null)
     setUploadResult(null)
+    setPreview(null)
     setShowAllErrors(false) // 重置展开状态
     if (fileInputRef.current) {
       fileInputRef.current.value = ''
@@ -160,7 +299,7 @@ export default function TransactionUploadPage() {
       <div>
         <h1 className="text-3xl font-bold text-gray-900">流水上传</h1>
         <p className="mt-2 text-sm text-gray-600">
-          上传员工流水Excel文件，系统将自动计算积分并更新用户数据
+          上传员工流水文件（Excel、CSV 或 Parquet），系统将自动计算积分并更新用户数据
         </p>
       </div>
 
@@ -175,7 +314,7 @@ export default function TransactionUploadPage() {
         <CardContent className="space-y-4">
           <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
             <div>
-              <h3 className="font-medium text-gray-900 mb-2">Excel文件格式要求：</h3>
+              <h3 className="font-medium text-gray-900 mb-2">文件格式要求：</h3>
               <ul className="text-sm text-gray-600 space-y-1">
                 <li>• 第1列：快手ID（必填）</li>
                 <li>• 第2列：主播名称（可选）</li>
@@ -186,10 +325,14 @@ export default function TransactionUploadPage() {
             <div>
               <h3 className="font-medium text-gray-900 mb-2">处理规则：</h3>
               <ul className="text-sm text-gray-600 space-y-1">
-                <li>• 直接覆盖用户当前积分</li>
+                <li>• 覆盖模式：直接覆盖用户当前积分</li>
+                <li>• 增量模式：与同一周期上次导入比较，只补加或扣减差额，不影响已兑换消耗的积分</li>
                 <li>• 仅更新已注册用户的数据</li>
-                <li>• 支持 .xlsx 和 .xls 格式</li>
+                <li>• 支持 .xlsx、.xls、.csv、.parquet、.arrow 格式，列顺序与模板相同</li>
+                <li>• 数据量大时建议使用 CSV 或 Parquet，处理速度更快</li>
                 <li>• 自动跳过空行和无效数据</li>
+                <li>• 同一快手ID出现多行时只采用第一行</li>
+                <li>• 可先"预览变更"查看每个用户的新旧积分，确认无误后再正式处理</li>
               </ul>
             </div>
           </div>
@@ -205,12 +348,44 @@ export default function TransactionUploadPage() {
       {/* 文件上传区域 */}
       <Card>
         <CardHeader>
-          <CardTitle>上传Excel文件</CardTitle>
+          <CardTitle>上传流水文件</CardTitle>
           <CardDescription>
             拖拽文件到下方区域或点击选择文件
           </CardDescription>
         </CardHeader>
         <CardContent>
+          <div className="grid grid-cols-1 md:grid-cols-2 gap-4 mb-6">
+            <div className="space-y-2">
+              <Label>导入模式</Label>
+              <Select
+                value={importMode}
+                onValueChange={(value) => setImportMode(value as ImportMode)}
+                disabled={uploadMutation.isPending}
+              >
+                <SelectTrigger>
+                  <SelectValue placeholder="选择导入模式" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="overwrite">覆盖积分</SelectItem>
+                  <SelectItem value="delta">增量（按周期比较）</SelectItem>
+                </SelectContent>
+              </Select>
+            </div>
+            {importMode === 'delta' && (
+              <div className="space-y-2">
+                <Label htmlFor="period">周期</Label>
+                <Input
+                  id="period"
+                  value={period}
+                  maxLength={32}
+                  placeholder="例如 2025-W35"
+                  onChange={(e) => setPeriod(e.target.value)}
+                  disabled={uploadMutation.isPending}
+                />
+              </div>
+            )}
+          </div>
+
           <div
             className={`border-2 border-dashed rounded-lg p-8 text-center transition-colors ${
               isDragOver
@@ -234,7 +409,15 @@ export default function TransactionUploadPage() {
                 </div>
                 <div className="flex justify-center space-x-4">
                   <Button
-                    onClick={handleUpload}
+                    variant="outline"
+                    onClick={() => handleUpload(true)}
+                    disabled={uploadMutation.isPending}
+                  >
+                    <Eye className="h-4 w-4 mr-2" />
+                    预览变更
+                  </Button>
+                  <Button
+                    onClick={() => handleUpload(false)}
                     disabled={uploadMutation.isPending}
                     className="bg-green-600 hover:bg-green-700"
                   >
@@ -260,7 +443,7 @@ export default function TransactionUploadPage() {
               <div className="space-y-4">
                 <Upload className="h-12 w-12 text-gray-400 mx-auto" />
                 <div>
-                  <p className="text-lg font-medium text-gray-900">拖拽Excel文件到这里</p>
+                  <p className="text-lg font-medium text-gray-900">拖拽流水文件到这里</p>
                   <p className="text-sm text-gray-500">或者点击下方按钮选择文件</p>
                 </div>
                 <Button
@@ -278,7 +461,7 @@ export default function TransactionUploadPage() {
           <input
             ref={fileInputRef}
             type="file"
-            accept=".xlsx,.xls"
+            accept={ACCEPTED_EXTENSIONS.join(',')}
             className="hidden"
             onChange={handleFileInputChange}
           />
@@ -292,16 +475,105 @@ export default function TransactionUploadPage() {
             <div className="space-y-4">
               <div className="flex items-center justify-between">
                 <span className="text-sm font-medium">正在处理文件...</span>
+                {jobProgress && (
+                  <span className="text-sm text-gray-600">
+                    已处理 {jobProgress.total_processed} 行，更新 {jobProgress.updated_count}，未找到 {jobProgress.not_found_count}
+                  </span>
+                )}
               </div>
               <Progress value={undefined} className="w-full" />
               <p className="text-xs text-gray-500 text-center">
-                请耐心等待，正在读取Excel文件并更新用户积分数据
+                请耐心等待，正在读取流水文件并更新用户积分数据
               </p>
             </div>
           </CardContent>
         </Card>
       )}
 
+      {/* 预览结果 */}
+      {preview && (
+        <Card>
+          <CardHeader>
+            <CardTitle className="flex items-center">
+              <Eye className="h-5 w-5 mr-2 text-blue-500" />
+              变更预览
+            </CardTitle>
+            <CardDescription>
+              预览不会修改任何积分，确认无误后点击"开始处理"正式导入
+            </CardDescription>
+          </CardHeader>
+          <CardContent className="space-y-4">
+            <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
+              <div className="bg-blue-50 p-4 rounded-lg border border-blue-200">
+                <div className="text-2xl font-bold text-blue-600">{preview.result.summary.total_count}</div>
+                <div className="text-sm text-blue-700 font-medium">有效行数</div>
+              </div>
+              <div className="bg-green-50 p-4 rounded-lg border border-green-200">
+                <div className="text-2xl font-bold text-green-600">{preview.result.summary.changed_count}</div>
+                <div className="text-sm text-green-700 font-medium">积分将变化</div>
+                <div className="text-xs text-green-600 mt-1">
+                  +{preview.result.summary.points_increase} / {preview.result.summary.points_decrease}
+                </div>
+              </div>
+              <div className="bg-red-50 p-4 rounded-lg border border-red-200">
+                <div className="text-2xl font-bold text-red-600">{preview.result.summary.negative_count}</div>
+                <div className="text-sm text-red-700 font-medium">积分将减少</div>
+                {preview.result.summary.negative_balance_count > 0 && (
+                  <div className="text-xs text-red-600 mt-1">
+                    其中 {preview.result.summary.negative_balance_count} 个用户积分将为负数
+                  </div>
+                )}
+              </div>
+              <div className="bg-orange-50 p-4 rounded-lg border border-orange-200">
+                <div className="text-2xl font-bold text-orange-600">{preview.result.summary.unknown_count}</div>
+                <div className="text-sm text-orange-700 font-medium">用户不存在</div>
+              </div>
+            </div>
+
+            {preview.result.items.length > 0 && (
+              <div className="overflow-x-auto">
+                <table className="w-full text-sm">
+                  <thead>
+                    <tr className="border-b text-left text-gray-600">
+                      <th className="py-2 pr-4">行号</th>
+                      <th className="py-2 pr-4">快手ID</th>
+                      <th className="py-2 pr-4">昵称</th>
+                      <th className="py-2 pr-4 text-right">当前积分</th>
+                      <th className="py-2 pr-4 text-right">导入后积分</th>
+                      <th className="py-2 text-right">变化</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {preview.result.items.map((item) => (
+                      <tr key={item.row} className="border-b last:border-0">
+                        <td className="py-2 pr-4">{item.row}</td>
+                        <td className="py-2 pr-4">{item.kuaishou_id}</td>
+                        <td className="py-2 pr-4">{item.nickname}</td>
+                        <td className="py-2 pr-4 text-right">{item.old_points}</td>
+                        <td className="py-2 pr-4 text-right">{item.new_points}</td>
+                        <td className={`py-2 text-right font-medium ${
+                          item.delta?.startsWith('-') ? 'text-red-600' : 'text-green-600'
+                        }`}>
+                          {item.delta}
+                        </td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            )}
+
+            {preview.result.next_cursor && (
+              <div className="text-center">
+                <Button variant="ghost" size="sm" onClick={loadMorePreview} disabled={loadingMore}>
+                  {loadingMore ? '加载中...' : '加载更多'}
+                </Button>
+              </div>
+            )}
+          </CardContent>
+        </Card>
+      )}
+
       {/* 处理结果 */}
       {uploadResult && (
         <div className="space-y-4">
@@ -321,7 +593,7 @@ export default function TransactionUploadPage() {
                 <div className="bg-blue-50 p-4 rounded-lg border border-blue-200">
                   <div className="text-2xl font-bold text-blue-600">{uploadResult.total_processed}</div>
                   <div className="text-sm text-blue-700 font-medium">总处理行数</div>
-                  <div className="text-xs text-blue-600 mt-1">Excel文件中的数据行数</div>
+                  <div className="text-xs text-blue-600 mt-1">文件中的数据行数</div>
                 </div>
                 <div className="bg-green-50 p-4 rounded-lg border border-green-200">
                   <div className="text-2xl font-bold text-green-600">{uploadResult.updated_count}</div>
@@ -423,7 +695,7 @@ export default function TransactionUploadPage() {
                     <li>⚠️ {uploadResult.not_found_count} 个快手ID在系统中不存在，需要用户先注册</li>
                   )}
                   <li>💡 您可以在"用户管理"页面查看更新后的积分情况</li>
-                  <li>🔄 如需重新处理，请修正Excel文件后再次上传</li>
+                  <li>🔄 如需重新处理，请修正文件后再次上传</li>
                 </ul>
               </div>
             </CardContent>
@@ -23,10 +23,49 @@ def create_app(config_class=Config):
     # 解决中文乱码问题
     app.json.ensure_ascii = False
 
+    # 按数据库类型选择连接池参数（配置中已显式设置 SQLALCHEMY_ENGINE_OPTIONS 时不覆盖）
+    from app.db_pool import engine_options, pool_metrics
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
     # 将扩展与应用实例绑定
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+
+    # 连接池统计
+    pool_metrics.init_app(app)
+
+    # SQLite 连接参数（WAL、busy_timeout 等）
+    from app.sqlite_profile import init_app as init_sqlite_profile
+    init_sqlite_profile(app)
+
+    # 热门奖品库存预占
+    from app.stock_reservation import stock_reservations
+    stock_reservations.init_app(app)
+
+    # 登录/注册限流
+    from app.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+
+    # 管理员身份缓存
+    from app.admin_cache import admin_status_cache
+    admin_status_cache.init_app(app)
+
+    # 积分变更通知
+    from app.points_feed import points_feed
+    points_feed.init_app(app)
+
+    # 积分流水校验命令
+    from app.points_ledger import init_app as init_points_ledger
+    init_points_ledger(app)
+
+    # 上传文件保存与图片缩放版本
+    from app.image_uploads import image_uploads
+    image_uploads.init_app(app)
+
+    # 奖品目录缓存
+    from app.catalog_cache import catalog_cache
+    catalog_cache.init_app(app)
     # 配置CORS，允许所有来源访问
     CORS(app, 
          origins=['*'],
@@ -46,14 +85,9 @@ def create_app(config_class=Config):
     app.register_blueprint(redemptions_bp, url_prefix='/api/redemptions')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
-    # 静态文件服务
-    import os
-    from flask import send_from_directory
-    
-    @app.route('/static/uploads/<filename>')
-    def uploaded_file(filename):
-        upload_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads')
-        return send_from_directory(upload_dir, filename)
+    # 上传文件访问（长期缓存、条件请求与 Range，可交给 nginx 发送）
+    from app.static_uploads import init_app as init_static_uploads
+    init_static_uploads(app)
 
     return app
 
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+管理员身份缓存
+- admin_required 校验时优先读取进程内缓存，命中时不查询数据库
+- 缓存在 ADMIN_CACHE_TTL 秒后过期；本进程修改 is_admin 时立即失效，其他进程最多延迟一个 TTL
+"""
+import threading
+import time
+
+from app import db
+from app.models import User
+
+
+class AdminStatusCache:
+    """user_id -> (是否管理员, 过期时间)"""
+
+    def __init__(self):
+        self.ttl = 30
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def init_app(self, app):
+        self.ttl = app.config['ADMIN_CACHE_TTL']
+
+    def is_admin(self, user_id):
+        """返回用户是否为管理员；用户不存在时返回 False"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        is_admin = bool(db.session.query(User.is_admin).filter_by(id=user_id).scalar())
+        with self._lock:
+            self._entries[user_id] = (is_admin, now + self.ttl)
+            # 清理已过期的条目，避免缓存无限增长
+            if len(self._entries) > 1024:
+                for key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                    del self._entries[key]
+        return is_admin
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+admin_status_cache = AdminStatusCache()
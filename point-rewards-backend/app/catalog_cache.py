@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+奖品目录缓存
+- 目录 JSON 只序列化一次，按内容计算强 ETag，客户端带 If-None-Match 时返回 304
+- 管理端新增/修改奖品后立即失效；多进程部署时其他进程最多在 CATALOG_CACHE_TTL 秒后刷新
+- 库存变化（兑换）不主动失效，同样由 TTL 兜底，兑换时仍以数据库库存为准
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class CatalogCache:
+    """按查询参数缓存序列化后的目录响应体"""
+
+    def __init__(self):
+        self.ttl = 60
+        self.max_entries = 256
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = 0
+
+    def init_app(self, app):
+        self.ttl = app.config['CATALOG_CACHE_TTL']
+        self.max_entries = app.config['CATALOG_CACHE_MAX_ENTRIES']
+
+    def get(self, key, build):
+        """
+        返回 (body, etag)；未命中或已过期时调用 build() 生成响应数据并缓存
+        build 返回可 JSON 序列化的对象
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[2] > now:
+                self._entries.move_to_end(key)
+                return entry[0], entry[1]
+            version = self._version
+
+        body = current_app.json.dumps(build()).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()
+
+        with self._lock:
+            # 构建期间被失效的结果不写入缓存
+            if version == self._version:
+                self._entries[key] = (body, etag, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return body, etag
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+登录凭证校验
+- 默认沿用 AES 加密存储：密钥的 SHA-256 摘要在进程内只计算一次，每次解密仍新建 AES 对象，比较使用常量时间比较
+- 开启 PASSWORD_HASH_MIGRATION 后，用户下次登录成功或修改密码时生成加盐哈希，
+  之后只校验哈希；哈希迭代次数由 PASSWORD_HASH_ITERATIONS 控制，即每次登录的 CPU 开销
+"""
+import hmac
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app.encryption import decrypt_password
+
+
+def hash_password(plain_password, iterations=None):
+    """生成 PBKDF2-SHA256 加盐哈希"""
+    iterations = iterations or current_app.config['PASSWORD_HASH_ITERATIONS']
+    return generate_password_hash(plain_password, method=f'pbkdf2:sha256:{iterations}')
+
+
+def verify_password(user, plain_password):
+    """
+    校验用户密码；开启迁移且旧用户校验通过时顺带写入 password_hash（由调用方提交）
+    """
+    if user.password_hash:
+        return check_password_hash(user.password_hash, plain_password)
+
+    try:
+        stored_password = decrypt_password(user.password_encrypted)
+    except Exception:
+        return False
+
+    matched = hmac.compare_digest(stored_password.encode(), plain_password.encode())
+    if matched and current_app.config['PASSWORD_HASH_MIGRATION']:
+        user.password_hash = hash_password(plain_password)
+    return matched
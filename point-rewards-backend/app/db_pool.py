@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+数据库连接池
+- 按 DATABASE_URL 的数据库类型选择连接池参数（大小、溢出、超时、回收、pre-ping），DB_POOL_* 环境变量可覆盖
+  SQLite 文件库：本地文件无网络断连，不做 pre-ping、不回收；PostgreSQL / MySQL：pre-ping 并定期回收
+- 统计每个连接池的取连接等待时间、使用中连接数、溢出连接与超时次数（每个 worker 进程各自统计），
+  供 GET /api/admin/db-pool 查看，据此调整每个 worker 的连接池大小
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app import db
+
+# 数据库类型 -> 默认连接池参数；pool_size 应不小于每个 worker 的线程数（GUNICORN_THREADS）
+POOL_PROFILES = {
+    'sqlite': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': -1, 'pool_pre_ping': False},
+    'postgresql': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': 1800, 'pool_pre_ping': True},
+    # 云数据库/代理常在数分钟后断开空闲连接
+    'mysql': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': 300, 'pool_pre_ping': True},
+}
+DEFAULT_PROFILE = {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': 1800, 'pool_pre_ping': True}
+
+# 参与计算等待时间分位数的最近取连接次数
+WAIT_SAMPLES = 1024
+
+
+class TimedQueuePool(QueuePool):
+    """记录每次取连接（含等待空闲连接、新建连接与 pre-ping）耗时的 QueuePool"""
+
+    stats = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            if self.stats:
+                self.stats.record_timeout()
+            raise
+        if self.stats:
+            self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose()（如 fork 之后）会重建连接池，沿用同一份统计
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(config):
+    """根据数据库 URL 生成 SQLALCHEMY_ENGINE_OPTIONS"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+
+    if backend == 'sqlite':
+        options = {'connect_args': {'check_same_thread': False}}
+        # 内存库由 Flask-SQLAlchemy 使用单连接的 StaticPool，不适用连接池参数
+        if url.database in (None, '', ':memory:'):
+            return options
+    else:
+        options = {}
+
+    profile = dict(POOL_PROFILES.get(backend, DEFAULT_PROFILE))
+    for key, name in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                      ('pool_timeout', 'DB_POOL_TIMEOUT'), ('pool_recycle', 'DB_POOL_RECYCLE'),
+                      ('pool_pre_ping', 'DB_POOL_PRE_PING')):
+        if config[name] is not None:
+            profile[key] = config[name]
+
+    options.update(profile, poolclass=TimedQueuePool)
+    return options
+
+
+class _PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.overflow_connects = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.peak_checked_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            waits = sorted(self._waits)
+            wait_count, wait_total, wait_max = self.wait_count, self.wait_total, self.wait_max
+            counters = {
+                'checkouts': self.checkouts,
+                'connects': self.connects,
+                'overflow_connects': self.overflow_connects,
+                'timeouts': self.timeouts,
+                'invalidations': self.invalidations,
+                'peak_checked_out': self.peak_checked_out,
+            }
+        return {
+            'pool_class': type(pool).__name__,
+            'size': pool.size() if isinstance(pool, QueuePool) else None,
+            'checked_out': pool.checkedout() if isinstance(pool, QueuePool) else None,
+            'overflow': max(pool.overflow(), 0) if isinstance(pool, QueuePool) else None,
+            **counters,
+            'wait_ms': {
+                'avg': round(wait_total / wait_count * 1000, 3) if wait_count else 0,
+                # 最近 WAIT_SAMPLES 次取连接的 p99
+                'p99': round(waits[max(0, math.ceil(0.99 * len(waits)) - 1)] * 1000, 3) if waits else 0,
+                'max': round(wait_max * 1000, 3),
+            },
+        }
+
+
+class PoolMetrics:
+    """通过连接池事件统计各个 engine 的连接使用情况"""
+
+    def __init__(self):
+        # engine -> _PoolStats；dispose 重建连接池时 engine 不变
+        self._stats = {}
+
+    def init_app(self, app):
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            stats = self._stats[engine] = _PoolStats()
+            if isinstance(engine.pool, TimedQueuePool):
+                engine.pool.stats = stats
+            self._listen(engine, stats)
+
+    def _listen(self, engine, stats):
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            pool = engine.pool
+            with stats._lock:
+                stats.connects += 1
+                # 连接数超过 pool_size 时 overflow() 为正，这是一条溢出连接
+                if isinstance(pool, QueuePool) and pool.overflow() > 0:
+                    stats.overflow_connects += 1
+
+        @event.listens_for(engine, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            pool = engine.pool
+            with stats._lock:
+                stats.checkouts += 1
+                if isinstance(pool, QueuePool):
+                    stats.peak_checked_out = max(stats.peak_checked_out, pool.checkedout())
+
+        @event.listens_for(engine, 'invalidate')
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with stats._lock:
+                stats.invalidations += 1
+
+    def stats(self):
+        engines = dict(db.engines)
+        result = {'pid': os.getpid(), 'pools': {}}
+        for key, engine in engines.items():
+            if engine in self._stats:
+                result['pools'][key or 'default'] = {
+                    'backend': engine.dialect.name,
+                    **self._stats[engine].snapshot(engine.pool),
+                }
+        return result
+
+
+pool_metrics = PoolMetrics()
@@ -6,9 +6,12 @@ import hashlib
 # 与前端相同的密钥
 SECRET_KEY = 'eternalmoon'
 
+# 密钥只在进程启动时派生一次
+_KEY = hashlib.sha256(SECRET_KEY.encode()).digest()
+
 def get_key():
     """生成AES密钥"""
-    return hashlib.sha256(SECRET_KEY.encode()).digest()
+    return _KEY
 
 def encrypt_password(password: str) -> str:
     """
@@ -36,8 +39,6 @@ def decrypt_password(encrypted_password: str) -> str:
     AES解密密码
     """
     try:
-        key = get_key()
-        
         # 解码base64
         encrypted_data = base64.b64decode(encrypted_password.encode())
         
@@ -46,7 +47,7 @@ def decrypt_password(encrypted_password: str) -> str:
         encrypted = encrypted_data[16:]
         
         # 解密
-        cipher = AES.new(key, AES.MODE_CBC, iv)
+        cipher = AES.new(_KEY, AES.MODE_CBC, iv)
         decrypted = cipher.decrypt(encrypted)
         
         # 去除填充
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+上传文件按内容寻址保存，并为图片生成缩放版本
+- 文件名为内容的 SHA-256，相同文件重复上传只保存一份，URL 不变
+- 图片在后台线程池中生成缩略图（thumb）和详情图（detail），各有 WebP 与 JPEG 两种格式，
+  命名为 <原文件名>_<规格>.<格式>，可直接由原图 URL 推出
+- 未安装 Pillow 时只保存原图，奖品接口不返回缩放版本
+- 缩放版本是否已生成缓存在进程内，奖品列表不必为每个奖品检查文件
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_URL_PREFIX = '/static/uploads/'
+
+# 保存上传文件时每次读取的字节数
+UPLOAD_READ_SIZE = 1024 * 1024
+
+# 规格 -> 最长边像素
+VARIANT_SIZES = {'thumb': 320, 'detail': 1080}
+# 格式 -> 文件扩展名
+VARIANT_FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# 缩放版本缺失的图片隔多少秒再检查文件（可能由其他进程或命令行生成）
+MISSING_RECHECK_SECONDS = 60
+
+
+def variant_name(filename, size, fmt):
+    stem = filename.rsplit('.', 1)[0]
+    return f"{stem}_{size}.{VARIANT_FORMATS[fmt]}"
+
+
+class ImageUploads:
+    """保存上传文件并在后台生成图片缩放版本"""
+
+    def __init__(self):
+        self.upload_folder = None
+        self.workers = 2
+        self.quality = 82
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        # 已生成全部缩放版本的文件名（文件名即内容摘要，生成后不会再变）
+        self._ready = set()
+        # 缺少缩放版本的文件名 -> 上次检查时间
+        self._missing = {}
+
+    def init_app(self, app):
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.workers = app.config['IMAGE_VARIANT_WORKERS']
+        self.quality = app.config['IMAGE_VARIANT_QUALITY']
+        app.cli.add_command(generate_image_variants_command)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-variant')
+        return self._executor
+
+    def save(self, file, extension):
+        """
+        边写临时文件边计算 SHA-256，以摘要命名保存，返回文件名
+        内容相同的文件已存在时丢弃本次上传；图片缺少缩放版本时提交后台生成
+        """
+        os.makedirs(self.upload_folder, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(prefix='.upload-', dir=self.upload_folder)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    block = file.stream.read(UPLOAD_READ_SIZE)
+                    if not block:
+                        break
+                    digest.update(block)
+                    out.write(block)
+
+            filename = f"{digest.hexdigest()}.{extension}"
+            path = os.path.join(self.upload_folder, filename)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if extension in IMAGE_EXTENSIONS:
+            self.schedule_variants(filename)
+        return filename
+
+    def _variant_paths(self, filename):
+        return [
+            os.path.join(self.upload_folder, variant_name(filename, size, fmt))
+            for size in VARIANT_SIZES for fmt in VARIANT_FORMATS
+        ]
+
+    def has_variants(self, filename):
+        """缩放版本是否已全部生成；已生成的结果一直缓存，缺失的结果缓存 MISSING_RECHECK_SECONDS 秒"""
+        if filename in self._ready:
+            return True
+        now = time.monotonic()
+        checked_at = self._missing.get(filename)
+        if checked_at is not None and now - checked_at < MISSING_RECHECK_SECONDS:
+            return False
+        if all(os.path.exists(path) for path in self._variant_paths(filename)):
+            self._mark_ready(filename)
+            return True
+        with self._lock:
+            self._missing[filename] = now
+        return False
+
+    def _mark_ready(self, filename):
+        with self._lock:
+            self._ready.add(filename)
+            self._missing.pop(filename, None)
+
+    def schedule_variants(self, filename):
+        """提交后台生成；已生成或正在生成时跳过"""
+        if not _pillow_available() or self.has_variants(filename):
+            return
+        with self._lock:
+            if filename in self._pending:
+                return
+            self._pending.add(filename)
+        app = current_app._get_current_object()
+        self._get_executor().submit(self._generate_in_background, app, filename)
+
+    def _generate_in_background(self, app, filename):
+        try:
+            self.generate_variants(filename)
+            # 目录缓存中的奖品可能引用了这张图片，刷新后即可返回缩放版本
+            with app.app_context():
+                from app.catalog_cache import catalog_cache
+                catalog_cache.invalidate()
+        except Exception:
+            logger.exception("生成图片缩放版本失败: %s", filename)
+        finally:
+            with self._lock:
+                self._pending.discard(filename)
+
+    def generate_variants(self, filename):
+        """生成全部规格与格式；每个文件先写临时文件再改名，不会读到半截图片"""
+        from PIL import Image, ImageOps
+
+        with Image.open(os.path.join(self.upload_folder, filename)) as source:
+            image = ImageOps.exif_transpose(source)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+            for size, longest in VARIANT_SIZES.items():
+                resized = image.copy()
+                resized.thumbnail((longest, longest), Image.Resampling.LANCZOS)
+                # JPEG 不支持透明通道，铺白底
+                if resized.mode == 'RGBA':
+                    flattened = Image.new('RGB', resized.size, (255, 255, 255))
+                    flattened.paste(resized, mask=resized.getchannel('A'))
+                else:
+                    flattened = resized
+
+                for fmt in VARIANT_FORMATS:
+                    target = os.path.join(self.upload_folder, variant_name(filename, size, fmt))
+                    tmp_path = f"{target}.tmp"
+                    if fmt == 'webp':
+                        resized.save(tmp_path, 'WEBP', quality=self.quality, method=4)
+                    else:
+                        flattened.save(tmp_path, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+                    os.replace(tmp_path, target)
+        self._mark_ready(filename)
+
+    def variant_urls(self, image_url):
+        """
+        奖品图片的缩放版本 URL：{"thumb": {"webp": ..., "jpeg": ...}, "detail": {...}}
+        非本站上传的图片或缩放版本尚未生成时返回 None
+        """
+        if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX):
+            return None
+        filename = image_url[len(UPLOAD_URL_PREFIX):]
+        if '/' in filename or '.' not in filename or filename.rsplit('.', 1)[1].lower() not in IMAGE_EXTENSIONS:
+            return None
+        if not self.has_variants(filename):
+            return None
+        return {
+            size: {fmt: UPLOAD_URL_PREFIX + variant_name(filename, size, fmt) for fmt in VARIANT_FORMATS}
+            for size in VARIANT_SIZES
+        }
+
+
+def _pillow_available():
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+image_uploads = ImageUploads()
+
+
+@click.command('generate-image-variants')
+@with_appcontext
+def generate_image_variants_command():
+    """为上传目录中已有的图片补齐缩放版本"""
+    if not _pillow_available():
+        click.echo("未安装 Pillow，无法生成缩放版本")
+        return
+    generated = failed = 0
+    for filename in sorted(os.listdir(image_uploads.upload_folder)):
+        stem, _, extension = filename.rpartition('.')
+        if extension.lower() not in IMAGE_EXTENSIONS or stem.endswith(tuple(f'_{s}' for s in VARIANT_SIZES)):
+            continue
+        if image_uploads.has_variants(filename):
+            continue
+        try:
+            image_uploads.generate_variants(filename)
+            generated += 1
+        except Exception as e:
+            failed += 1
+            click.echo(f"{filename}: {e}")
+    click.echo(f"已生成 {generated} 张图片的缩放版本，失败 {failed} 张")
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+流水导入后台任务
+- 上传文件先落盘，立即返回任务ID，由进程内线程池执行导入
+- 任务状态与进度保存在 import_job 表中，多进程部署时任意 worker 都能查询
+- 按文件内容的 SHA-256 识别重复上传，直接返回已有任务的结果
+- dry_run 任务只解析并暂存到 import_staging，供预览接口比较，不修改积分
+- 执行中的任务每次刷新进度都会更新心跳；worker 重启或崩溃后留下的未完成任务在心跳超时后标记为失败，不再被复用
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import ImportJob
+from app.import_preview import preview_summary, purge_expired_previews
+from app.transaction_import import import_transactions, stage_transactions, TransactionImportError, MODE_OVERWRITE
+
+# 保存上传文件时每次读取的字节数
+UPLOAD_READ_SIZE = 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    """按配置的线程数延迟创建进程内线程池"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config['IMPORT_JOB_WORKERS'],
+                thread_name_prefix='import-job'
+            )
+    return _executor
+
+
+def shutdown_executor():
+    """进程退出前等待正在执行和排队的导入任务完成（gunicorn worker_exit 中调用）"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _update_job(job_id, **values):
+    """更新任务并刷新心跳；已被标记为失败的任务不再更新，避免中断后又被改回完成"""
+    ImportJob.query.filter(
+        ImportJob.id == job_id, ImportJob.status != 'failed'
+    ).update(dict(values, heartbeat_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def _stale_cutoff():
+    return datetime.utcnow() - timedelta(minutes=current_app.config['IMPORT_JOB_STALE_MINUTES'])
+
+
+def is_stale(job):
+    """任务未完成且心跳超时（只读判断，不写库）"""
+    return (job.status in ('pending', 'running') and job.heartbeat_at is not None
+            and job.heartbeat_at < _stale_cutoff())
+
+
+def fail_stale_jobs(job_id=None):
+    """把心跳超时的 pending / running 任务标记为失败，返回标记的数量；指定 job_id 时只处理该任务"""
+    query = ImportJob.query.filter(
+        ImportJob.status.in_(('pending', 'running')), ImportJob.heartbeat_at < _stale_cutoff()
+    )
+    if job_id is not None:
+        query = query.filter(ImportJob.id == job_id)
+    failed = query.update({
+        'status': 'failed',
+        'message': '任务长时间没有进度，可能因服务重启而中断，请重新上传',
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return failed
+
+
+def _run_preview_job(app, job_id, path, filename):
+    """预览任务：解析并暂存后，用一次集合查询得到匹配与变化情况写回任务"""
+    def report(result):
+        _update_job(job_id, processed_count=result['total_processed'])
+
+    with open(path, 'rb') as stream:
+        result = stage_transactions(
+            stream, filename, job_id,
+            chunk_size=app.config['TRANSACTION_IMPORT_CHUNK_SIZE'],
+            progress=report
+        )
+
+    summary = preview_summary(db.session.get(ImportJob, job_id))
+    _update_job(
+        job_id,
+        status='completed',
+        processed_count=result['total_processed'],
+        updated_count=summary['matched_count'],
+        changed_count=summary['changed_count'],
+        not_found_count=summary['unknown_count'],
+        error_records=result['error_records'],
+        finished_at=datetime.utcnow()
+    )
+
+
+def _run_import_job(app, job_id, path, filename, mode, period, dry_run=False):
+    """在后台线程中执行导入，并在每块提交后刷新任务进度"""
+    with app.app_context():
+        try:
+            # 排队过久已被判定为中断的任务不再执行
+            started = ImportJob.query.filter_by(id=job_id, status='pending').update(
+                {'status': 'running', 'heartbeat_at': datetime.utcnow()}
+            )
+            db.session.commit()
+            if not started:
+                return
+            if dry_run:
+                _run_preview_job(app, job_id, path, filename)
+                return
+
+            def report(result):
+                _update_job(
+                    job_id,
+                    processed_count=result['total_processed'],
+                    updated_count=result['updated_count'],
+                    changed_count=result['changed_count'],
+                    not_found_count=result['not_found_count']
+                )
+
+            with open(path, 'rb') as stream:
+                result = import_transactions(
+                    stream, filename,
+                    chunk_size=app.config['TRANSACTION_IMPORT_CHUNK_SIZE'],
+                    progress=report,
+                    ref=job_id,
+                    mode=mode,
+                    period=period
+                )
+
+            _update_job(
+                job_id,
+                status='completed',
+                processed_count=result['total_processed'],
+                updated_count=result['updated_count'],
+                changed_count=result['changed_count'],
+                not_found_count=result['not_found_count'],
+                error_records=result['error_records'],
+                finished_at=datetime.utcnow()
+            )
+        except TransactionImportError as e:
+            db.session.rollback()
+            _update_job(job_id, status='failed', message=str(e), finished_at=datetime.utcnow())
+        except Exception as e:
+            db.session.rollback()
+            _update_job(job_id, status='failed', message=f"处理流水数据失败: {str(e)}",
+                        finished_at=datetime.utcnow())
+        finally:
+            os.remove(path)
+
+
+def _save_upload(file, suffix):
+    """边写临时文件边计算 SHA-256，返回 (路径, 摘要)"""
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix='import-', suffix=suffix)
+    with os.fdopen(fd, 'wb') as out:
+        while True:
+            block = file.stream.read(UPLOAD_READ_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+    return path, digest.hexdigest()
+
+
+def find_reusable_job(content_hash, mode, period, dry_run=False):
+    """
+    相同内容、相同模式与周期且未失败的任务；重复上传直接复用其结果
+    预览任务只复用仍在保留期内的（暂存数据未被清理）
+    """
+    query = ImportJob.query.filter(
+        ImportJob.content_hash == content_hash,
+        ImportJob.mode == mode,
+        ImportJob.period.is_(None) if period is None else ImportJob.period == period,
+        ImportJob.dry_run.is_(dry_run),
+        ImportJob.status != 'failed'
+    )
+    if dry_run:
+        query = query.filter(ImportJob.created_at >= preview_expiry())
+    return query.order_by(ImportJob.created_at.desc()).first()
+
+
+def preview_expiry():
+    """早于该时间创建的预览任务已过期"""
+    return datetime.utcnow() - timedelta(hours=current_app.config['IMPORT_PREVIEW_RETENTION_HOURS'])
+
+
+def submit_import_job(file, user_id, mode=MODE_OVERWRITE, period=None, force=False, dry_run=False):
+    """
+    保存上传文件并提交后台导入任务，返回 (ImportJob, 是否复用了已有任务)
+    字节完全相同的文件重复上传时返回已有任务，不再导入；force=True 时总是重新导入
+    dry_run=True 时只生成预览，不修改积分
+    """
+    app = current_app._get_current_object()
+
+    suffix = os.path.splitext(file.filename)[1].lower()
+    path, content_hash = _save_upload(file, suffix)
+
+    if dry_run:
+        purge_expired_previews(app.config['IMPORT_PREVIEW_RETENTION_HOURS'])
+
+    if not force:
+        # 中断的任务先标记为失败，避免复用一个永远不会完成的任务
+        fail_stale_jobs()
+        existing = find_reusable_job(content_hash, mode, period, dry_run)
+        if existing:
+            os.remove(path)
+            return existing, True
+
+    job = ImportJob(id=uuid.uuid4().hex, filename=file.filename, mode=mode, period=period,
+                    content_hash=content_hash, dry_run=dry_run, created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor(app).submit(_run_import_job, app, job.id, path, file.filename, mode, period, dry_run)
+    return job, False
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+流水导入预览（dry run）
+- 解析结果暂存在 import_staging 表，不修改任何用户数据
+- 暂存表与 user（增量模式再加 import_snapshot）做一次 LEFT JOIN 即可得到每行的新旧积分，
+  汇总与分页明细都基于同一个集合查询，由数据库完成比较
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, case, func
+
+from app import db
+from app.models import ImportJob, ImportStaging, ImportSnapshot, User
+from app.pagination import PaginationError, keyset_page, parse_limit
+from app.transaction_import import MODE_DELTA, POINTS_QUANTUM
+
+PREVIEW_FILTERS = ('changed', 'unknown', 'negative', 'all')
+
+
+def _diff_columns(job):
+    """返回 (查询, 变化量, 新积分)；查询为暂存行 LEFT JOIN 用户（及增量快照）"""
+    query = (
+        db.session.query(ImportStaging)
+        .outerjoin(User, User.kuaishouId == ImportStaging.kuaishou_id)
+        .filter(ImportStaging.job_id == job.id)
+    )
+    if job.mode == MODE_DELTA:
+        # 增量模式：本次应加的积分 = 文件中的积分 - 本周期上次导入的积分
+        query = query.outerjoin(ImportSnapshot, and_(
+            ImportSnapshot.period == job.period,
+            ImportSnapshot.kuaishou_id == ImportStaging.kuaishou_id
+        ))
+        delta = ImportStaging.points - func.coalesce(ImportSnapshot.points, 0)
+        new_points = User.points + delta
+    else:
+        delta = ImportStaging.points - User.points
+        new_points = ImportStaging.points
+    return query, delta, new_points
+
+
+def _points(value):
+    return str(Decimal(str(value or 0)).quantize(POINTS_QUANTUM))
+
+
+def preview_summary(job):
+    """一次聚合查询得到预览汇总：匹配/未找到/有变化/积分减少的行数与增减合计"""
+    query, delta, new_points = _diff_columns(job)
+    matched = User.id.isnot(None)
+    row = query.with_entities(
+        func.count(ImportStaging.row),
+        func.count(User.id),
+        func.sum(case((and_(matched, delta != 0), 1), else_=0)),
+        func.sum(case((and_(matched, delta < 0), 1), else_=0)),
+        func.sum(case((and_(matched, new_points < 0), 1), else_=0)),
+        func.sum(case((and_(matched, delta > 0), delta), else_=0)),
+        func.sum(case((and_(matched, delta < 0), delta), else_=0)),
+    ).one()
+    total, matched_count, changed, negative, negative_balance, increase, decrease = row
+    return {
+        "total_count": total,
+        "matched_count": matched_count,
+        "unknown_count": total - matched_count,
+        "changed_count": changed or 0,
+        "unchanged_count": matched_count - (changed or 0),
+        "negative_count": negative or 0,
+        "negative_balance_count": negative_balance or 0,
+        "points_increase": _points(increase),
+        "points_decrease": _points(decrease),
+    }
+
+
+def preview_rows(job, args):
+    """
+    按文件行号游标分页返回明细，filter 取值：
+    changed（默认，积分有变化）/ unknown（快手ID不存在）/ negative（积分减少）/ all
+    """
+    kind = args.get('filter', 'changed')
+    if kind not in PREVIEW_FILTERS:
+        raise PaginationError(f"filter 必须是 {' / '.join(PREVIEW_FILTERS)} 之一")
+
+    query, delta, new_points = _diff_columns(job)
+    if kind == 'changed':
+        query = query.filter(User.id.isnot(None), delta != 0)
+    elif kind == 'unknown':
+        query = query.filter(User.id.is_(None))
+    elif kind == 'negative':
+        query = query.filter(User.id.isnot(None), delta < 0)
+
+    query = query.with_entities(
+        ImportStaging.row, ImportStaging.kuaishou_id, ImportStaging.points,
+        User.id, User.nickname, User.points, delta, new_points
+    )
+    rows, next_cursor = keyset_page(
+        query, [ImportStaging.row], args.get('cursor'), parse_limit(args),
+        key_of=lambda r: [r[0]],
+        cast=lambda values: [int(values[0])]
+    )
+
+    items = []
+    for row, kuaishou_id, file_points, user_id, nickname, old_points, diff, new in rows:
+        items.append({
+            "row": row,
+            "kuaishou_id": kuaishou_id,
+            "file_points": _points(file_points),
+            "user_id": user_id,
+            "nickname": nickname,
+            "old_points": _points(old_points) if user_id is not None else None,
+            "new_points": _points(new) if user_id is not None else None,
+            "delta": _points(diff) if user_id is not None else None,
+        })
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def purge_expired_previews(retention_hours):
+    """删除超过保留时间的预览暂存数据（任务记录保留），返回删除的行数"""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    expired = db.session.query(ImportJob.id).filter(ImportJob.dry_run.is_(True), ImportJob.created_at < cutoff)
+    deleted = (
+        ImportStaging.query
+        .filter(ImportStaging.job_id.in_(expired.scalar_subquery()))
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
@@ -1,6 +1,9 @@
 from app import db
+from flask import current_app
 from datetime import datetime
+from decimal import Decimal
 from app.encryption import encrypt_password, decrypt_password
+from app.credentials import hash_password, verify_password
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -8,22 +11,34 @@ class User(db.Model):
     kuaishouId = db.Column(db.String(80), unique=True, nullable=False)
     phone = db.Column(db.String(20), unique=True, nullable=False)
     password_encrypted = db.Column(db.Text, nullable=False)  # 存储加密后的密码
+    password_hash = db.Column(db.String(255), nullable=True)  # 加盐哈希（开启 PASSWORD_HASH_MIGRATION 后写入）
     points = db.Column(db.DECIMAL(10, 2), nullable=False, default=10.00)  # 支持小数点积分，初始给10积分
     addresses = db.Column(db.JSON, nullable=True, default=[])
     is_admin = db.Column(db.Boolean, nullable=False, default=False) # 管理员标识
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # 积分或地址变化时 +1
     redemptions = db.relationship('Redemption', backref='user', lazy=True)
 
+    # 管理端用户列表：按积分游标分页、按昵称前缀搜索（快手ID/手机号已有唯一索引）
+    __table_args__ = (
+        db.Index('ix_user_points_id', 'points', 'id'),
+        db.Index('ix_user_nickname', 'nickname'),
+    )
+
     def set_password(self, plain_password):
-        """设置密码（存储加密后的密码）"""
+        """设置密码（存储加密后的密码，开启哈希迁移时同时存储加盐哈希）"""
         self.password_encrypted = encrypt_password(plain_password)
+        if current_app.config['PASSWORD_HASH_MIGRATION']:
+            self.password_hash = hash_password(plain_password)
+        else:
+            self.password_hash = None
 
     def check_password(self, plain_password):
         """验证密码"""
-        try:
-            stored_password = decrypt_password(self.password_encrypted)
-            return stored_password == plain_password
-        except:
-            return False
+        return verify_password(self, plain_password)
+
+    def bump_version(self):
+        """积分或地址变化时调用，随本次提交一起 +1（用于 /api/user/me 的 ETag 与变更通知）"""
+        self.version = User.version + 1
     
     def get_decrypted_password(self):
         """管理员用：获取解密后的密码"""
@@ -41,6 +56,12 @@ class Prize(db.Model):
     category = db.Column(db.String(50), nullable=True)
     stock = db.Column(db.Integer, nullable=False, default=10) # 默认库存10
 
+    # 目录游标分页 (points, id) 及按分类筛选
+    __table_args__ = (
+        db.Index('ix_prize_points_id', 'points', 'id'),
+        db.Index('ix_prize_category_points_id', 'category', 'points', 'id'),
+    )
+
 class Redemption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -49,4 +70,72 @@ class Redemption(db.Model):
     status = db.Column(db.String(50), nullable=False, default='completed') # 默认状态为完成
     shipping_address = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # 是否已计入 Prize.stock；热门奖品走内存预占时为 False，批量回写后置为 True
+    stock_synced = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     prize = db.relationship('Prize')
+
+    # 用户兑换历史与管理端列表按创建时间游标分页；库存回写按奖品查找未回写的记录
+    __table_args__ = (
+        db.Index('ix_redemption_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_redemption_created_at', 'created_at'),
+        db.Index('ix_redemption_prize_id_stock_synced', 'prize_id', 'stock_synced'),
+    )
+
+class ImportJob(db.Model):
+    """流水导入后台任务，记录进度与最终错误报告"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid hex
+    filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending / running / completed / failed
+    processed_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_count = db.Column(db.Integer, nullable=False, default=0)
+    not_found_count = db.Column(db.Integer, nullable=False, default=0)
+    error_records = db.Column(db.JSON, nullable=True)
+    message = db.Column(db.Text, nullable=True)  # 失败原因
+    mode = db.Column(db.String(20), nullable=False, default='overwrite', server_default='overwrite')  # overwrite / delta
+    period = db.Column(db.String(32), nullable=True)  # 增量导入的周期，如 2025-W35
+    changed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # 上传文件的 SHA-256，用于识别重复上传
+    dry_run = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # 仅预览，不修改积分
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # 执行中每次刷新进度时更新；超过 IMPORT_JOB_STALE_MINUTES 未更新的未完成任务视为已中断
+    heartbeat_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+
+class ImportStaging(db.Model):
+    """导入预览暂存的解析结果（已取整的积分），预览时与 user 表做一次连接比较，过期后清理"""
+    __tablename__ = 'import_staging'
+    job_id = db.Column(db.String(32), db.ForeignKey('import_job.id'), primary_key=True)
+    row = db.Column(db.Integer, primary_key=True)  # 文件中的行号
+    kuaishou_id = db.Column(db.String(80), nullable=False)
+    points = db.Column(db.DECIMAL(10, 2), nullable=False)
+
+class ImportSnapshot(db.Model):
+    """增量导入快照：某周期内每个快手ID最近一次导入的积分"""
+    __tablename__ = 'import_snapshot'
+    period = db.Column(db.String(32), primary_key=True)
+    kuaishou_id = db.Column(db.String(80), primary_key=True)
+    points = db.Column(db.DECIMAL(10, 2), nullable=False)
+    job_id = db.Column(db.String(32), nullable=True)
+
+class PointsLedger(db.Model):
+    """积分流水（只追加）：User.points 是其按用户求和的物化结果，二者在同一事务中更新"""
+    __tablename__ = 'points_ledger'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    delta = db.Column(db.DECIMAL(12, 2), nullable=False)  # 积分变化量，扣减为负数
+    reason = db.Column(db.String(20), nullable=False)  # opening / redeem / admin / import
+    ref = db.Column(db.String(64), nullable=True)  # 关联对象：兑换ID、导入任务ID、操作管理员ID
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # 按用户区间分批求和（重算余额）
+    __table_args__ = (
+        db.Index('ix_points_ledger_user_id_id', 'user_id', 'id'),
+    )
+
+@db.event.listens_for(User, 'after_insert')
+def _record_opening_points(mapper, connection, target):
+    """新用户的初始积分记为一条 opening 流水，保证流水求和与余额一致"""
+    connection.execute(PointsLedger.__table__.insert().values(
+        user_id=target.id, delta=Decimal(str(target.points)), reason='opening', created_at=datetime.utcnow()
+    ))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+游标（keyset）分页工具
+- 游标是上一页最后一行排序键的 base64 编码，下一页用 WHERE 条件从该位置继续，不使用 OFFSET
+- 排序键最后一列必须唯一（通常是 id），保证翻页稳定
+- 总数估计在 PostgreSQL 以外的数据库上需要 COUNT 扫描，结果按查询缓存 COUNT_CACHE_TTL 秒
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import and_, or_, text
+
+from app import db
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# COUNT 结果的缓存秒数与最多缓存的查询数（每个进程各自缓存）
+COUNT_CACHE_TTL = 60
+COUNT_CACHE_MAX_ENTRIES = 256
+
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+
+class PaginationError(ValueError):
+    """分页或筛选参数不合法"""
+
+
+def _cursor_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_cursor_value(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise PaginationError("无效的分页游标")
+    if not isinstance(values, list):
+        raise PaginationError("无效的分页游标")
+    return values
+
+
+def parse_limit(args, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        raise PaginationError("limit 必须是整数")
+    if limit <= 0:
+        raise PaginationError("limit 必须大于0")
+    return min(limit, maximum)
+
+
+def parse_decimal(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise PaginationError(f"{name} 必须是数字")
+
+
+def parse_datetime(args, name):
+    """解析 ISO 格式的日期或时间，带时区的转换为 UTC（数据库中保存的是 UTC 时间）"""
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"{name} 必须是 ISO 格式的日期或时间")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def keyset_after(columns, values, descending=False):
+    """
+    生成 "排在 values 之后" 的条件，等价于行值比较 (c1, c2) > (v1, v2)
+    展开成 OR/AND 形式，兼容不支持行值比较或无法用其走索引的数据库
+    """
+    conditions = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*equal, beyond))
+    return or_(*conditions)
+
+
+def keyset_page(query, columns, cursor, limit, key_of, descending=False, cast=None):
+    """
+    按 columns 排序取一页数据，返回 (rows, next_cursor)
+    key_of(row) 返回该行的排序键列表；cast(values) 可把游标中的字符串还原成列类型
+    """
+    order = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise PaginationError("无效的分页游标")
+        if cast:
+            try:
+                values = cast(values)
+            except Exception:
+                raise PaginationError("无效的分页游标")
+        query = query.filter(keyset_after(columns, values, descending))
+
+    # 多取一行用于判断是否还有下一页
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = encode_cursor(key_of(rows[limit - 1])) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def prefix_upper_bound(prefix):
+    """
+    以 prefix 开头的字符串都小于返回值（把最后一个字符的码位加一），用于把前缀匹配写成范围条件
+    按码位比较（SQLite 的 BINARY、PostgreSQL 的 C 排序）时成立；prefix 全由最大码位组成时返回 None（无上界）
+    """
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            # 跳过代理区，代理码位无法编码为 UTF-8
+            successor = 0xE000 if 0xD800 <= last + 1 <= 0xDFFF else last + 1
+            return prefix[:-1] + chr(successor)
+        prefix = prefix[:-1]
+    return None
+
+
+def estimate_count(query):
+    """
+    总数估计：PostgreSQL 上无筛选条件时读取 pg_class.reltuples（不扫表），
+    其余情况执行 COUNT，相同的查询在 COUNT_CACHE_TTL 秒内复用上次的结果
+    """
+    statement = query.statement
+    if db.engine.dialect.name == 'postgresql' and statement.whereclause is None:
+        table = query.column_descriptions[0]['entity'].__table__.name
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"), {'table': table}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    compiled = statement.compile(dialect=db.engine.dialect)
+    key = (str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[1] > now:
+            _count_cache.move_to_end(key)
+            return cached[0]
+
+    count = query.order_by(None).count()
+    with _count_cache_lock:
+        _count_cache[key] = (count, now + COUNT_CACHE_TTL)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+    return count
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+用户积分变更通知
+- 每个用户有一个 version 计数器，积分或地址变化时在同一事务中 +1（见 User.bump_version）
+- 提交后调用 points_feed.notify(user_ids) 唤醒本进程内等待该用户的长轮询请求
+- 其他进程（多 worker 部署）产生的变更没有本地通知，等待方按 USER_FEED_POLL_INTERVAL 回查数据库兜底
+- 挂起的请求会占住一个 gthread 线程，每个进程同时挂起的请求不超过 USER_FEED_MAX_WAITERS，
+  超出时 listen 返回 None，调用方只做一次检查后立即返回，其余线程留给普通请求
+"""
+import threading
+
+
+class _Listener:
+    """单个长轮询请求的等待句柄"""
+
+    def __init__(self, feed, user_id):
+        self.feed = feed
+        self.user_id = user_id
+        self.seen = feed._sequence.get(user_id, 0)
+
+    def wait(self, timeout):
+        """等待该用户的下一次变更通知，返回是否收到通知"""
+        feed = self.feed
+        with feed._cond:
+            notified = feed._cond.wait_for(
+                lambda: feed._sequence.get(self.user_id, 0) != self.seen, timeout
+            )
+            self.seen = feed._sequence.get(self.user_id, 0)
+        return notified
+
+
+class PointsFeed:
+    """只为有等待者的用户记录通知序号，没有长轮询请求时 notify 几乎没有开销"""
+
+    def __init__(self):
+        self.timeout = 10
+        self.poll_interval = 5
+        self.max_waiters = 2
+        self._cond = threading.Condition()
+        self._waiters = {}
+        self._total = 0
+        self._sequence = {}
+
+    def init_app(self, app):
+        self.timeout = app.config['USER_FEED_TIMEOUT']
+        self.poll_interval = app.config['USER_FEED_POLL_INTERVAL']
+        self.max_waiters = app.config['USER_FEED_MAX_WAITERS']
+
+    def listen(self, user_id):
+        """注册等待者；须在读取当前版本之前调用，避免读取与等待之间的通知丢失；本进程等待者已满时返回 None"""
+        with self._cond:
+            if self._total >= self.max_waiters:
+                return None
+            self._total += 1
+            self._waiters[user_id] = self._waiters.get(user_id, 0) + 1
+            return _Listener(self, user_id)
+
+    def unlisten(self, listener):
+        with self._cond:
+            self._total -= 1
+            remaining = self._waiters.get(listener.user_id, 0) - 1
+            if remaining > 0:
+                self._waiters[listener.user_id] = remaining
+            else:
+                self._waiters.pop(listener.user_id, None)
+                self._sequence.pop(listener.user_id, None)
+
+    def notify(self, user_ids):
+        with self._cond:
+            woken = False
+            for user_id in user_ids:
+                if user_id in self._waiters:
+                    self._sequence[user_id] = self._sequence.get(user_id, 0) + 1
+                    woken = True
+            if woken:
+                self._cond.notify_all()
+
+
+points_feed = PointsFeed()
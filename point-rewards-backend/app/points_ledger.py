@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+积分流水
+- 所有积分变化都追加一条 points_ledger 记录，并在同一事务中更新 User.points（物化余额）
+- record_entries 使用一次多行 INSERT 批量写入，导入时每块只多一条语句
+- reaggregate 按用户ID区间流式分批求和，校验或重建物化余额；每批单独提交，可从任意用户ID继续
+"""
+from decimal import Decimal
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select, update, func, bindparam
+
+from app import db
+from app.models import User, PointsLedger
+from app.points_feed import points_feed
+
+REAGGREGATE_BATCH_SIZE = 10000
+
+
+def record_entries(entries):
+    """批量追加流水；entries 为 {'user_id', 'delta', 'reason', 'ref'} 字典列表，由调用方提交"""
+    if entries:
+        db.session.execute(insert(PointsLedger), entries)
+
+
+def record_entry(user_id, delta, reason, ref=None):
+    record_entries([{'user_id': user_id, 'delta': delta, 'reason': reason, 'ref': ref}])
+
+
+def reaggregate(batch_size=REAGGREGATE_BATCH_SIZE, rebuild=False, start_after=0, progress=None):
+    """
+    逐批比较 User.points 与流水求和，返回 {'checked', 'mismatched', 'rebuilt', 'last_user_id', 'samples'}
+    rebuild=True 时把不一致的余额改为流水求和；只在余额仍等于读取值时更新，并发变更的用户留给下一次运行
+    progress: 可选回调，每批提交后以当前统计结果调用一次
+    """
+    users = User.__table__
+    ledger = PointsLedger.__table__
+    result = {'checked': 0, 'mismatched': 0, 'rebuilt': 0, 'last_user_id': start_after, 'samples': []}
+
+    while True:
+        rows = db.session.execute(
+            select(users.c.id, users.c.points)
+            .where(users.c.id > result['last_user_id'])
+            .order_by(users.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        sums = dict(db.session.execute(
+            select(ledger.c.user_id, func.sum(ledger.c.delta))
+            .where(ledger.c.user_id.between(rows[0].id, rows[-1].id))
+            .group_by(ledger.c.user_id)
+        ).all())
+
+        mismatched = []
+        for user_id, points in rows:
+            total = Decimal(sums.get(user_id) or 0)
+            if total != points:
+                mismatched.append({'user_id': user_id, 'observed': points, 'balance': total})
+
+        result['checked'] += len(rows)
+        result['mismatched'] += len(mismatched)
+        result['samples'].extend(mismatched[:max(0, 100 - len(result['samples']))])
+
+        if rebuild and mismatched:
+            rebuilt = db.session.execute(
+                update(users)
+                .where(users.c.id == bindparam('user_id'), users.c.points == bindparam('observed'))
+                .values(points=bindparam('balance'), version=users.c.version + 1),
+                mismatched
+            ).rowcount
+            result['rebuilt'] += rebuilt
+
+        # 每批提交一次，释放读快照与行锁
+        db.session.commit()
+        if rebuild and mismatched:
+            points_feed.notify([m['user_id'] for m in mismatched])
+
+        result['last_user_id'] = rows[-1].id
+        if progress:
+            progress(result)
+
+    return result
+
+
+@click.command('verify-points')
+@click.option('--rebuild', is_flag=True, help='把不一致的余额改为流水求和')
+@click.option('--batch-size', default=REAGGREGATE_BATCH_SIZE, show_default=True, help='每批处理的用户数')
+@click.option('--start-after', default=0, help='从该用户ID之后继续（中断后恢复）')
+@with_appcontext
+def verify_points_command(rebuild, batch_size, start_after):
+    """校验（或重建）用户积分余额与积分流水是否一致"""
+    def report(result):
+        click.echo(f"已检查 {result['checked']} 个用户，不一致 {result['mismatched']}，"
+                   f"已重建 {result['rebuilt']}，最后用户ID {result['last_user_id']}")
+
+    result = reaggregate(batch_size=batch_size, rebuild=rebuild, start_after=start_after, progress=report)
+    for sample in result['samples']:
+        click.echo(f"用户 {sample['user_id']}: 余额 {sample['observed']}，流水求和 {sample['balance']}")
+    click.echo('完成')
+
+
+def init_app(app):
+    app.cli.add_command(verify_points_command)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+登录/注册限流
+- 令牌桶：容量即允许的突发次数，按固定速率回填；超限请求在执行任何 SQL 之前直接返回 429
+- 同时按客户端IP和手机号计数，撞库时单个IP或单个手机号都会被拦住
+- 默认使用进程内存储，多进程/多机部署可换成共享后端（实现相同的 consume 接口即可）
+- 客户端IP取 X-Forwarded-For 中由可信代理追加的那一项（RATE_LIMIT_PROXY_HOPS），客户端自带的前缀无法伪造
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify
+
+
+def parse_rate(rate):
+    """'20/60' -> (容量20, 每秒回填 20/60 个令牌)"""
+    count, seconds = rate.split('/')
+    count, seconds = int(count), float(seconds)
+    if count <= 0 or seconds <= 0:
+        raise ValueError(f"无效的限流配置: {rate}")
+    return count, count / seconds
+
+
+class LocalRateLimitBackend:
+    """进程内令牌桶存储"""
+
+    def __init__(self, max_keys=100000, prune_ratio=0.1):
+        self.max_keys = max_keys
+        self.prune_ratio = prune_ratio
+        self._lock = threading.Lock()
+        # 按最近访问排序，最久未访问的在前
+        self._buckets = OrderedDict()
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """
+        尝试取走一个令牌，返回 (是否允许, 需要等待的秒数)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                allowed, retry_after = True, 0
+            else:
+                allowed, retry_after = False, (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._prune()
+        return allowed, retry_after
+
+    def _prune(self):
+        """超出上限时一次淘汰 prune_ratio 比例的最久未访问的桶，均摊到每次插入是常数开销"""
+        for _ in range(len(self._buckets) - int(self.max_keys * (1 - self.prune_ratio))):
+            self._buckets.popitem(last=False)
+
+
+class RateLimiter:
+    """按 IP / 手机号限流，并记录每个 key 的放行与拒绝次数"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalRateLimitBackend()
+        self.enabled = True
+        self.proxy_hops = 0
+        self.rates = {}
+        self.max_tracked_keys = 10000
+        self._lock = threading.Lock()
+        self._counters = OrderedDict()
+
+    def init_app(self, app):
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.proxy_hops = app.config['RATE_LIMIT_PROXY_HOPS']
+        self.rates = {
+            'ip': parse_rate(app.config['AUTH_RATE_LIMIT_PER_IP']),
+            'phone': parse_rate(app.config['AUTH_RATE_LIMIT_PER_PHONE']),
+        }
+
+    def client_ip(self):
+        """
+        每层代理把上一跳的地址追加到 X-Forwarded-For 末尾，只有最后 proxy_hops 项可信，
+        倒数第 proxy_hops 项即可信代理看到的客户端地址；项数不足说明请求没有经过全部代理，使用直连地址
+        """
+        if self.proxy_hops:
+            forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+            if len(forwarded) >= self.proxy_hops:
+                return forwarded[-self.proxy_hops]
+        return request.remote_addr or 'unknown'
+
+    def hit(self, kind, scope, value):
+        """消耗一个令牌，返回 (是否允许, 需要等待的秒数)"""
+        key = f'{scope}:{kind}:{value}'
+        capacity, refill_rate = self.rates[kind]
+        allowed, retry_after = self.backend.consume(key, capacity, refill_rate)
+        self._count(key, allowed)
+        return allowed, retry_after
+
+    def _count(self, key, allowed):
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.max_tracked_keys:
+                    # 计数表满时淘汰最久未访问的 key
+                    self._counters.popitem(last=False)
+                counter = self._counters[key] = {'allowed': 0, 'rejected': 0}
+            else:
+                self._counters.move_to_end(key)
+            counter['allowed' if allowed else 'rejected'] += 1
+
+    def stats(self, limit=100):
+        """按拒绝次数倒序返回各 key 的计数"""
+        with self._lock:
+            items = sorted(self._counters.items(), key=lambda kv: (-kv[1]['rejected'], -kv[1]['allowed']))
+            return [{'key': key, **counter} for key, counter in items[:limit]]
+
+    def limit(self, scope):
+        """路由装饰器：按客户端IP和请求体中的 phone 限流"""
+        def wrapper(fn):
+            @wraps(fn)
+            def decorator(*args, **kwargs):
+                if self.enabled:
+                    checks = [('ip', self.client_ip())]
+                    data = request.get_json(silent=True)
+                    if isinstance(data, dict) and data.get('phone'):
+                        checks.append(('phone', str(data['phone'])))
+
+                    for kind, value in checks:
+                        allowed, retry_after = self.hit(kind, scope, value)
+                        if not allowed:
+                            response = jsonify({"code": 429, "message": "请求过于频繁，请稍后再试", "data": {}})
+                            response.status_code = 429
+                            response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                            return response
+                return fn(*args, **kwargs)
+            return decorator
+        return wrapper
+
+
+rate_limiter = RateLimiter()
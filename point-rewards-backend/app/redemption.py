@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+奖品兑换核心逻辑
+- 库存与积分都使用带条件的单条 UPDATE 扣减，数据库保证并发下不超卖、积分不为负
+- 扣减库存的 UPDATE 同时锁住奖品行，之后读取的兑换价格在本事务内保持一致
+- 热门奖品的库存改由内存计数器预占，只在批量回写时更新 prize 行（见 app.stock_reservation）
+- SQLite 上写锁等待超时会回滚后重试写库事务，提交成功后的库存确认与通知不在重试范围内（见 app.sqlite_profile）
+"""
+from sqlalchemy import update
+
+from app import db
+from app.models import User, Prize, Redemption
+from app.stock_reservation import stock_reservations
+from app.points_feed import points_feed
+from app.points_ledger import record_entry
+from app.sqlite_profile import retry_on_busy
+
+
+class RedemptionError(Exception):
+    """兑换失败，message 为提示信息，code 为对应的 HTTP 状态码"""
+
+    def __init__(self, message, code=400):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def _take_points(user_id, price):
+    """UPDATE user SET points = points - ?, version = version + 1 WHERE id = ? AND points >= ?"""
+    points_taken = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.points >= price)
+        .values(points=User.points - price, version=User.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not points_taken:
+        if not db.session.query(User.id).filter_by(id=user_id).first():
+            raise RedemptionError("用户不存在", 404)
+        raise RedemptionError("用户积分不足", 400)
+
+
+def _add_redemption(user_id, prize_id, price, shipping_address, stock_synced=True):
+    """写兑换记录，并追加对应的积分流水（流水引用兑换ID，需先 flush 取得ID）"""
+    redemption = Redemption(
+        user_id=user_id,
+        prize_id=prize_id,
+        points_spent=price,
+        shipping_address=shipping_address,
+        stock_synced=stock_synced
+    )
+    db.session.add(redemption)
+    db.session.flush()
+    record_entry(user_id, -price, 'redeem', str(redemption.id))
+    return redemption
+
+
+@retry_on_busy
+def _commit_reserved(user_id, prize_id, shipping_address):
+    """热门奖品的写库事务：扣积分、写兑换记录并提交（库存已在内存中预占）"""
+    try:
+        price = db.session.query(Prize.points).filter_by(id=prize_id).scalar()
+        _take_points(user_id, price)
+
+        # 库存尚未从 Prize.stock 扣减，等待批量回写
+        redemption = _add_redemption(user_id, prize_id, price, shipping_address, stock_synced=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return redemption
+
+
+def _redeem_reserved(user_id, prize_id, shipping_address):
+    """热门奖品：先在内存中预占库存，扣积分并写兑换记录成功后再确认"""
+    if not stock_reservations.reserve(prize_id):
+        raise RedemptionError("奖品库存不足", 400)
+
+    try:
+        redemption = _commit_reserved(user_id, prize_id, shipping_address)
+    except Exception:
+        stock_reservations.release(prize_id)
+        raise
+
+    stock_reservations.confirm(prize_id)
+    return redemption
+
+
+@retry_on_busy
+def _commit_redemption(user_id, prize_id, shipping_address):
+    """普通奖品的写库事务：扣库存 -> 扣积分 -> 写兑换记录与积分流水，并提交"""
+    try:
+        if not db.session.query(Prize.id).filter_by(id=prize_id).first():
+            raise RedemptionError("奖品不存在", 404)
+
+        # UPDATE prize SET stock = stock - 1 WHERE id = ? AND stock > 0
+        stock_taken = db.session.execute(
+            update(Prize)
+            .where(Prize.id == prize_id, Prize.stock > 0)
+            .values(stock=Prize.stock - 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not stock_taken:
+            raise RedemptionError("奖品库存不足", 400)
+
+        price = db.session.query(Prize.points).filter_by(id=prize_id).scalar()
+
+        _take_points(user_id, price)
+
+        redemption = _add_redemption(user_id, prize_id, price, shipping_address)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return redemption
+
+
+def redeem(user_id, prize_id, shipping_address=None):
+    """
+    在一个事务中完成兑换：扣库存 -> 扣积分 -> 写兑换记录与积分流水
+    任一步失败都会回滚并抛出 RedemptionError；只有提交之前的事务会重试，提交成功后的确认与通知只执行一次
+    """
+    if stock_reservations.tracks(prize_id):
+        redemption = _redeem_reserved(user_id, prize_id, shipping_address)
+    else:
+        redemption = _commit_redemption(user_id, prize_id, shipping_address)
+
+    points_feed.notify([user_id])
+    return redemption
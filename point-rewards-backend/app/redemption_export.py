@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+兑换记录导出（发货用）
+- 按 (created_at, id) 游标分批查询，每批一次 JOIN 带出用户、奖品与收货地址
+- CSV 与 XLSX 都边查边输出：XLSX 的工作表 XML 逐批写入不落盘的 zip 流
+- 无论导出多少行，内存中只保留一批数据
+- 以 = + - @ 等开头的文本加 ' 前缀，防止在 Excel 中被当作公式执行
+- XLSX 单个工作表最多 1048576 行，超出时应缩小筛选范围或导出 CSV
+"""
+import csv
+import io
+import zipfile
+from datetime import datetime
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from app import db
+from app.models import User, Prize, Redemption
+from app.pagination import keyset_page
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_HEADERS = ['兑换ID', '兑换时间', '状态', '用户ID', '用户昵称', '快手ID', '手机号',
+                  '奖品ID', '奖品名称', '消耗积分', '收货地址']
+
+# XLSX 工作表行数上限（含表头）
+XLSX_MAX_ROWS = 1048576
+
+# 电子表格会当作公式解析的首字符
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# XML 1.0 不允许的控制字符
+_XML_ILLEGAL = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+
+def export_query():
+    return db.session.query(
+        Redemption.id, Redemption.created_at, Redemption.status,
+        User.id.label('user_id'), User.nickname, User.kuaishouId, User.phone,
+        Prize.id.label('prize_id'), Prize.name.label('prize_name'),
+        Redemption.points_spent, Redemption.shipping_address
+    ).join(User, Redemption.user_id == User.id).join(Prize, Redemption.prize_id == Prize.id)
+
+
+def _cast_cursor(values):
+    return [datetime.fromisoformat(values[0]), int(values[1])]
+
+
+def escape_formula(value):
+    """用户填写的文本以公式字符开头时加 ' 前缀，按纯文本显示"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_export_rows(query, batch_size=EXPORT_BATCH_SIZE):
+    """按创建时间倒序分批查询并产出导出行"""
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(
+            query, [Redemption.created_at, Redemption.id], cursor, batch_size,
+            key_of=lambda r: [r.created_at, r.id], descending=True, cast=_cast_cursor
+        )
+        for r in rows:
+            yield [
+                r.id, r.created_at.isoformat(sep=' ', timespec='seconds'), escape_formula(r.status),
+                r.user_id, escape_formula(r.nickname), escape_formula(r.kuaishouId), escape_formula(r.phone),
+                r.prize_id, escape_formula(r.prize_name), str(r.points_spent), escape_formula(r.shipping_address or '')
+            ]
+        if cursor is None:
+            break
+
+
+def generate_csv(query):
+    """逐批产出 CSV 文本，带 BOM 以便 Excel 正确识别中文"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_HEADERS)
+    pending = 0
+    for row in iter_export_rows(query):
+        writer.writerow(row)
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+class _StreamBuffer:
+    """zip 的输出目标：只追加、不可 seek，由生成器定期取走已写入的字节"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="兑换记录" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    # 数字写成数值单元格，其余一律是内联字符串，不会被解析为公式
+    if isinstance(value, int):
+        return f'<c t="n"><v>{value}</v></c>'
+    text = escape(str(value).translate(_XML_ILLEGAL))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>'
+
+
+def generate_xlsx(query):
+    """逐批把行写入 zip 流中的工作表 XML 并输出已压缩的字节，不生成临时文件"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(EXPORT_HEADERS).encode())
+            rows = []
+            # 统计行数之后新增的记录可能使总数超限，超出部分不写入
+            for row in islice(iter_export_rows(query), XLSX_MAX_ROWS - 1):
+                rows.append(_xlsx_row(row))
+                if len(rows) >= EXPORT_BATCH_SIZE:
+                    sheet.write(''.join(rows).encode())
+                    rows.clear()
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write(''.join(rows).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def xlsx_fits(query):
+    """筛选结果能否放进一个 XLSX 工作表"""
+    return query.order_by(None).count() < XLSX_MAX_ROWS
@@ -1,16 +1,31 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from functools import wraps
-from flask import jsonify, request, send_from_directory, current_app
+from flask import jsonify, request, send_from_directory, current_app, Response, stream_with_context
 from flask.blueprints import Blueprint
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import User, Prize, Redemption
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.models import User, Prize, Redemption, ImportJob
 from app import db
+from app.import_jobs import submit_import_job, preview_expiry, fail_stale_jobs, is_stale
+from app.import_preview import preview_summary, preview_rows
+from app.transaction_import import IMPORT_MODES, MODE_OVERWRITE, MODE_DELTA, POINTS_QUANTUM, TRANSACTION_FILE_EXTENSIONS
+from app.stock_reservation import stock_reservations
+from app.catalog_cache import catalog_cache
+from app.image_uploads import image_uploads
+from app.rate_limit import rate_limiter
+from app.db_pool import pool_metrics
+from app.admin_cache import admin_status_cache
+from app.points_feed import points_feed
+from app.points_ledger import record_entry
+from app.sqlite_profile import retry_on_busy
+from app.pagination import PaginationError, keyset_page, parse_limit, estimate_count, prefix_upper_bound
+from app.routes.prizes import query_prizes, prize_to_dict
+from app.routes.redemptions import list_redemptions, filter_redemptions
+from app.redemption_export import export_query, generate_csv, generate_xlsx, xlsx_fits
 import os
-import uuid
-import pandas as pd
-from werkzeug.utils import secure_filename
-from decimal import Decimal
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import and_, or_
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -26,56 +41,138 @@ def admin_required():
         @wraps(fn)
         @jwt_required()
         def decorator(*args, **kwargs):
-            user_id = get_jwt_identity()
-            current_user = User.query.get(user_id)
-            if not current_user or not current_user.is_admin:
+            # 登录时签入的 is_admin 声明为 False 时直接拒绝；否则以缓存的数据库状态为准，
+            # 这样取消管理员权限可以在 TTL 内生效，而不必等待令牌过期
+            if get_jwt().get('is_admin') is False:
+                return error_response("管理员权限不足", 403)
+            if not admin_status_cache.is_admin(int(get_jwt_identity())):
                 return error_response("管理员权限不足", 403)
             return fn(*args, **kwargs)
         return decorator
     return wrapper
 
 # --- 用户管理 ---
+# 排序方式 -> (排序键, 是否倒序)
+USER_SORTS = {
+    'id': ([User.id], False),
+    'points_desc': ([User.points, User.id], True),
+    'points_asc': ([User.points, User.id], False),
+}
+
+def user_to_dict(u):
+    return {
+        'id': u.id, 'nickname': u.nickname, 'kuaishouId': u.kuaishouId, 
+        'phone': u.phone, 'points': u.points, 'is_admin': u.is_admin, 'addresses': u.addresses
+    }
+
 @admin_bp.route('/users', methods=['GET'])
 @admin_required()
 def get_users():
-    users = User.query.all()
-    users_data = [{
-        'id': u.id, 'nickname': u.nickname, 'kuaishouId': u.kuaishouId, 
-        'phone': u.phone, 'points': u.points, 'is_admin': u.is_admin, 'addresses': u.addresses
-    } for u in users]
-    return success_response("获取用户列表成功", users_data)
+    """
+    用户列表；传入 limit / cursor / q / sort 时游标分页，返回 {items, next_cursor, total_estimate}
+    total_estimate 只在第一页计算，非 PostgreSQL 上为短时间缓存的 COUNT 结果
+    q: 按昵称前缀、快手ID或手机号搜索；sort: id（默认）/ points_desc / points_asc
+    """
+    args = request.args
+    if 'limit' not in args and 'cursor' not in args and 'q' not in args and 'sort' not in args:
+        users = User.query.all()
+        return success_response("获取用户列表成功", [user_to_dict(u) for u in users])
+
+    try:
+        sort = args.get('sort', 'id')
+        if sort not in USER_SORTS:
+            raise PaginationError("sort 仅支持 id、points_desc 或 points_asc")
+        columns, descending = USER_SORTS[sort]
+
+        query = User.query
+        keyword = args.get('q', '').strip()
+        if keyword:
+            # 前缀匹配写成范围条件，可以直接使用昵称索引（LIKE 在 SQLite 上不区分大小写、用不上索引）
+            upper = prefix_upper_bound(keyword)
+            nickname_match = User.nickname >= keyword
+            if upper is not None:
+                nickname_match = and_(nickname_match, User.nickname < upper)
+            query = query.filter(or_(
+                nickname_match,
+                User.kuaishouId == keyword,
+                User.phone == keyword
+            ))
+
+        if sort == 'id':
+            cast = lambda values: [int(values[0])]
+            key_of = lambda u: [u.id]
+        else:
+            cast = lambda values: [Decimal(values[0]), int(values[1])]
+            key_of = lambda u: [u.points, u.id]
+
+        users, next_cursor = keyset_page(
+            query, columns, args.get('cursor'), parse_limit(args),
+            key_of=key_of, descending=descending, cast=cast
+        )
+    except PaginationError as e:
+        return error_response(str(e), 400)
+
+    return success_response("获取用户列表成功", {
+        'items': [user_to_dict(u) for u in users],
+        'next_cursor': next_cursor,
+        'total_estimate': None if args.get('cursor') else estimate_count(query)
+    })
+
+@retry_on_busy
+def _save_user(user_id, data, operator_id):
+    """修改用户信息并提交，返回 (用户, 错误信息)；SQLite 锁超时时整体重试"""
+    # 修改积分时锁住用户行，保证流水中的变化量基于最新余额
+    user = db.session.get(User, user_id, with_for_update='points' in data)
+
+    if not user:
+        return None, ("用户不存在", 404)
+
+    # 更新用户信息
+    if 'nickname' in data:
+        user.nickname = data['nickname']
+    if 'kuaishouId' in data:
+        # 检查快手ID是否已被其他用户使用
+        existing_user = User.query.filter(User.kuaishouId == data['kuaishouId'], User.id != user_id).first()
+        if existing_user:
+            return None, ("该快手ID已被其他用户使用", 400)
+        user.kuaishouId = data['kuaishouId']
+    if 'phone' in data:
+        # 检查手机号是否已被其他用户使用
+        existing_user = User.query.filter(User.phone == data['phone'], User.id != user_id).first()
+        if existing_user:
+            return None, ("该手机号已被其他用户使用", 400)
+        user.phone = data['phone']
+    if 'points' in data:
+        # 按积分列精度取整后再计算变化量，保证余额与流水一致
+        try:
+            points = Decimal(str(data['points'])).quantize(POINTS_QUANTUM, rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            points = None
+        if points is None or not points.is_finite():
+            return None, ("积分格式不正确", 400)
+        delta = points - user.points
+        user.points = points
+        user.bump_version()
+        if delta:
+            record_entry(user.id, delta, 'admin', operator_id)
+    if 'is_admin' in data:
+        user.is_admin = data['is_admin']
+
+    db.session.commit()
+    return user, None
 
 @admin_bp.route('/users/<int:user_id>', methods=['PUT'])
 @admin_required()
 def update_user(user_id):
     try:
         data = request.get_json()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return error_response("用户不存在", 404)
-        
-        # 更新用户信息
-        if 'nickname' in data:
-            user.nickname = data['nickname']
-        if 'kuaishouId' in data:
-            # 检查快手ID是否已被其他用户使用
-            existing_user = User.query.filter(User.kuaishouId == data['kuaishouId'], User.id != user_id).first()
-            if existing_user:
-                return error_response("该快手ID已被其他用户使用", 400)
-            user.kuaishouId = data['kuaishouId']
-        if 'phone' in data:
-            # 检查手机号是否已被其他用户使用
-            existing_user = User.query.filter(User.phone == data['phone'], User.id != user_id).first()
-            if existing_user:
-                return error_response("该手机号已被其他用户使用", 400)
-            user.phone = data['phone']
+        user, error = _save_user(user_id, data, get_jwt_identity())
+        if error:
+            return error_response(*error)
+
+        admin_status_cache.invalidate(user_id)
         if 'points' in data:
-            user.points = data['points']
-        if 'is_admin' in data:
-            user.is_admin = data['is_admin']
-        
-        db.session.commit()
+            points_feed.notify([user_id])
         
         user_data = {
             'id': user.id,
@@ -92,15 +189,31 @@ def update_user(user_id):
         db.session.rollback()
         return error_response(f"更新用户信息失败: {str(e)}", 500)
 
+@admin_bp.route('/rate-limits', methods=['GET'])
+@admin_required()
+def get_rate_limits():
+    """查看登录/注册限流计数（按拒绝次数倒序）"""
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return error_response("limit 必须是整数", 400)
+    return success_response("获取限流统计成功", rate_limiter.stats(limit))
+
+@admin_bp.route('/db-pool', methods=['GET'])
+@admin_required()
+def get_db_pool_stats():
+    """查看当前 worker 进程的数据库连接池统计（取连接等待、使用中连接数、溢出与超时）"""
+    return success_response("获取连接池统计成功", pool_metrics.stats())
+
 # --- 奖品管理 ---
 @admin_bp.route('/prizes', methods=['GET'])
 @admin_required()
 def get_prizes():
-    prizes = Prize.query.all()
-    prizes_data = [{
-        'id': p.id, 'name': p.name, 'description': p.description, 'points': p.points, 
-        'category': p.category, 'stock': p.stock, 'image': p.image
-    } for p in prizes]
+    # 与公开目录相同的筛选/排序/游标分页参数
+    try:
+        prizes_data = query_prizes(request.args)
+    except PaginationError as e:
+        return error_response(str(e), 400)
     return success_response("获取奖品列表成功", prizes_data)
 
 @admin_bp.route('/prizes', methods=['POST'])
@@ -127,16 +240,9 @@ def create_prize():
         
         db.session.add(new_prize)
         db.session.commit()
+        catalog_cache.invalidate()
         
-        prize_data = {
-            'id': new_prize.id,
-            'name': new_prize.name,
-            'description': new_prize.description,
-            'points': new_prize.points,
-            'category': new_prize.category,
-            'stock': new_prize.stock,
-            'image': new_prize.image
-        }
+        prize_data = prize_to_dict(new_prize)
         
         return success_response("奖品创建成功", prize_data, 201)
         
@@ -154,6 +260,11 @@ def update_prize(prize_id):
         if not prize:
             return error_response("奖品不存在", 404)
         
+        # 热门奖品先回写已确认的兑换，避免覆盖库存后再被重复扣减
+        hot_prize = 'stock' in data and stock_reservations.tracks(prize_id)
+        if hot_prize:
+            stock_reservations.flush(prize_id)
+        
         # 更新奖品信息
         if 'name' in data:
             prize.name = data['name']
@@ -170,15 +281,11 @@ def update_prize(prize_id):
         
         db.session.commit()
         
-        prize_data = {
-            'id': prize.id,
-            'name': prize.name,
-            'description': prize.description,
-            'points': prize.points,
-            'category': prize.category,
-            'stock': prize.stock,
-            'image': prize.image
-        }
+        catalog_cache.invalidate()
+        if hot_prize:
+            stock_reservations.reconcile(prize_id)
+        
+        prize_data = prize_to_dict(prize)
         
         return success_response("奖品信息更新成功", prize_data)
         
@@ -190,14 +297,51 @@ def update_prize(prize_id):
 @admin_bp.route('/redemptions', methods=['GET'])
 @admin_required()
 def get_redemptions():
-    redemptions = Redemption.query.order_by(Redemption.created_at.desc()).all()
-    redemptions_data = [{
-        'id': r.id, 'user_id': r.user_id, 'prize_id': r.prize_id, 'prize_name': r.prize.name,
-        'points_spent': r.points_spent, 'status': r.status, 'shipping_address': r.shipping_address,
-        'created_at': r.created_at.isoformat()
-    } for r in redemptions]
+    """兑换记录；支持 from / to / status 筛选，传入 limit 或 cursor 时游标分页"""
+    # 一次 JOIN 查询带出奖品名称和用户昵称，避免逐条懒加载
+    query = db.session.query(
+        Redemption.id, Redemption.user_id, Redemption.prize_id,
+        Prize.name.label('prize_name'), User.nickname.label('user_nickname'),
+        Redemption.points_spent, Redemption.status, Redemption.shipping_address, Redemption.created_at
+    ).join(Prize, Redemption.prize_id == Prize.id).join(User, Redemption.user_id == User.id)
+    try:
+        redemptions_data = list_redemptions(query, request.args, lambda r: {
+            'id': r.id, 'user_id': r.user_id, 'user_nickname': r.user_nickname, 'prize_id': r.prize_id,
+            'prize_name': r.prize_name, 'points_spent': r.points_spent, 'status': r.status,
+            'shipping_address': r.shipping_address, 'created_at': r.created_at.isoformat()
+        })
+    except PaginationError as e:
+        return error_response(str(e), 400)
     return success_response("获取兑换记录成功", redemptions_data)
 
+@admin_bp.route('/redemptions/export', methods=['GET'])
+@admin_required()
+def export_redemptions():
+    """流式导出兑换记录（含用户、奖品、收货地址），支持 from / to / status 筛选"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx'):
+        return error_response("仅支持导出 csv 或 xlsx 格式", 400)
+    try:
+        query = filter_redemptions(export_query(), request.args)
+    except PaginationError as e:
+        return error_response(str(e), 400)
+    
+    filename = f"redemptions-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    if export_format == 'csv':
+        body = generate_csv(query)
+        mimetype = 'text/csv'  # Flask 会为 text/* 自动追加 charset=utf-8
+    else:
+        if not xlsx_fits(query):
+            return error_response("导出行数超过 XLSX 上限（1048576 行），请缩小时间范围或导出 CSV", 400)
+        body = generate_xlsx(query)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # --- 文件上传 ---
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'xlsx', 'xls'}
 
@@ -218,18 +362,9 @@ def upload_file():
         if not allowed_file(file.filename):
             return error_response("不支持的文件格式，仅支持: png, jpg, jpeg, gif, webp, xlsx, xls", 400)
         
-        # 生成唯一文件名
-        filename = secure_filename(file.filename)
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-        
-        # 确保上传目录存在
-        upload_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'static', 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # 保存文件
-        file_path = os.path.join(upload_dir, unique_filename)
-        file.save(file_path)
+        # 按内容摘要命名，相同文件只保存一份；图片的缩放版本在后台生成
+        file_extension = file.filename.rsplit('.', 1)[1].lower()
+        unique_filename = image_uploads.save(file, file_extension)
         
         # 返回文件URL
         file_url = f"/static/uploads/{unique_filename}"
@@ -275,79 +410,117 @@ def upload_transaction():
             return error_response("没有选择文件", 400)
         
         # 检查文件格式
-        if not file.filename.lower().endswith(('.xlsx', '.xls')):
-            return error_response("仅支持Excel文件格式(.xlsx, .xls)", 400)
-        
-        # 读取Excel文件
-        try:
-            df = pd.read_excel(file, header=0)
-        except Exception as e:
-            return error_response(f"读取Excel文件失败: {str(e)}", 400)
-        
-        # 验证Excel格式
-        if len(df.columns) < 3:
-            return error_response("Excel文件格式不正确，需要至少3列：快手ID、主播名称、流水", 400)
-        
-        # 重命名列名以便处理
-        df.columns = ['kuaishou_id', 'anchor_name', 'transaction', *df.columns[3:]]
-        
-        # 数据处理统计
-        updated_count = 0
-        not_found_count = 0
-        error_records = []
-        
-        for index, row in df.iterrows():
-            try:
-                kuaishou_id = str(row['kuaishou_id']).strip()
-                transaction = float(row['transaction']) if pd.notna(row['transaction']) else 0
-                
-                # 跳过空的快手ID行
-                if not kuaishou_id or kuaishou_id == 'nan':
-                    continue
-                
-                # 计算积分：流水 / 10
-                points = Decimal(str(transaction / 10))
-                
-                # 查找用户
-                user = User.query.filter_by(kuaishouId=kuaishou_id).first()
-                if user:
-                    # 更新用户积分（直接覆盖）
-                    user.points = points
-                    updated_count += 1
-                else:
-                    not_found_count += 1
-                    error_records.append({
-                        'row': index + 2,  # Excel行号（从2开始，因为有标题行）
-                        'kuaishou_id': kuaishou_id,
-                        'reason': '用户不存在'
-                    })
-                    
-            except Exception as e:
-                error_records.append({
-                    'row': index + 2,
-                    'kuaishou_id': str(row.get('kuaishou_id', '未知')),
-                    'reason': f'数据处理错误: {str(e)}'
-                })
-        
-        # 提交数据库更改
-        db.session.commit()
-        
-        # 返回处理结果
-        result = {
-            'updated_count': updated_count,
-            'not_found_count': not_found_count,
-            'total_processed': len(df),
-            'error_records': error_records  # 返回所有错误记录
-        }
-        
-        return success_response("流水数据处理完成", result)
+        if not file.filename.lower().endswith(TRANSACTION_FILE_EXTENSIONS):
+            return error_response("仅支持Excel、CSV、Parquet或Arrow文件(.xlsx, .xls, .csv, .parquet, .arrow, .feather)", 400)
+        
+        # 导入模式：overwrite（默认，覆盖积分）/ delta（与同一周期的上次导入比较，只加减差额）
+        mode = request.form.get('mode') or MODE_OVERWRITE
+        period = (request.form.get('period') or '').strip() or None
+        if mode not in IMPORT_MODES:
+            return error_response("mode 仅支持 overwrite 或 delta", 400)
+        if mode == MODE_DELTA and not period:
+            return error_response("增量导入必须指定周期", 400)
+        if period and len(period) > 32:
+            return error_response("周期不能超过32个字符", 400)
+        
+        # 提交后台任务，立即返回任务ID；内容相同的文件重复上传时返回已有任务（force=true 强制重新导入）
+        # dry_run=true 只生成预览（GET /import-jobs/<id>/preview），不修改积分
+        force = request.form.get('force', '').lower() == 'true'
+        dry_run = request.form.get('dry_run', '').lower() == 'true'
+        job, reused = submit_import_job(file, int(get_jwt_identity()), mode, period, force, dry_run)
+        
+        if reused:
+            return success_response("该文件已上传过，返回已有处理结果",
+                                    {'job_id': job.id, 'status': job.status, 'reused': True}, 202)
+        return success_response("流水文件已提交处理", {'job_id': job.id, 'status': job.status, 'reused': False}, 202)
         
     except Exception as e:
         db.session.rollback()
-        return error_response(f"处理流水数据失败: {str(e)}", 500)
+        return error_response(f"提交流水处理任务失败: {str(e)}", 500)
+
+def import_job_data(job):
+    return {
+        'job_id': job.id,
+        'filename': job.filename,
+        'status': job.status,
+        'total_processed': job.processed_count,
+        'mode': job.mode,
+        'period': job.period,
+        'dry_run': job.dry_run,
+        'updated_count': job.updated_count,
+        'changed_count': job.changed_count,
+        'not_found_count': job.not_found_count,
+        'error_count': len(job.error_records or []),
+        'message': job.message,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+@admin_bp.route('/import-jobs/<job_id>', methods=['GET'])
+@admin_required()
+def get_import_job(job_id):
+    """查询流水导入任务进度；轮询只读，只有该任务心跳超时时才写库标记失败"""
+    job = ImportJob.query.get(job_id)
+    if not job:
+        return error_response("导入任务不存在", 404)
+    if is_stale(job):
+        fail_stale_jobs(job.id)
+        db.session.refresh(job)
+    return success_response("获取导入任务成功", import_job_data(job))
+
+@admin_bp.route('/import-jobs/<job_id>/errors', methods=['GET'])
+@admin_required()
+def get_import_job_errors(job_id):
+    """获取导入任务的最终结果与错误报告"""
+    job = ImportJob.query.get(job_id)
+    if not job:
+        return error_response("导入任务不存在", 404)
+    if job.status == 'failed':
+        return error_response(job.message or "导入任务失败", 400)
+    if job.status != 'completed':
+        return error_response("导入任务尚未完成", 409)
+    
+    result = {
+        'mode': job.mode,
+        'period': job.period,
+        'updated_count': job.updated_count,
+        'changed_count': job.changed_count,
+        'not_found_count': job.not_found_count,
+        'total_processed': job.processed_count,
+        'error_records': job.error_records or []
+    }
+    return success_response("获取导入结果成功", result)
+
+@admin_bp.route('/import-jobs/<job_id>/preview', methods=['GET'])
+@admin_required()
+def get_import_job_preview(job_id):
+    """
+    预览任务的变更汇总与明细（按文件行号游标分页）
+    查询参数：filter=changed|unknown|negative|all、limit、cursor
+    """
+    job = ImportJob.query.get(job_id)
+    if not job:
+        return error_response("导入任务不存在", 404)
+    if not job.dry_run:
+        return error_response("该任务不是预览任务", 400)
+    if job.status == 'failed':
+        return error_response(job.message or "导入任务失败", 400)
+    if job.status != 'completed':
+        return error_response("导入任务尚未完成", 409)
+    if job.created_at < preview_expiry():
+        return error_response("预览已过期，请重新上传", 410)
+    
+    try:
+        page = preview_rows(job, request.args)
+    except PaginationError as e:
+        return error_response(str(e), 400)
+    
+    result = {
+        'mode': job.mode,
+        'period': job.period,
+        'summary': preview_summary(job),
+        'items': page['items'],
+        'next_cursor': page['next_cursor']
+    }
+    return success_response("获取导入预览成功", result)
 
-@admin_bp.route('/static/uploads/<filename>')
-def uploaded_file(filename):
-    """提供上传文件的访问"""
-    upload_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'static', 'uploads')
-    return send_from_directory(upload_dir, filename)
@@ -4,6 +4,7 @@ from app.models import User
 from app import db
 from flask_jwt_extended import create_access_token
 from app.encryption import decrypt_password, is_encrypted_password
+from app.rate_limit import rate_limiter
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -26,6 +27,7 @@ def error_response(message="操作失败", code=400, data=None):
     return jsonify(response), code, {'Content-Type': 'application/json; charset=utf-8'}
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limiter.limit('register')
 def register():
     try:
         data = request.get_json()
@@ -77,6 +79,7 @@ def register():
         return error_response(f"注册失败: {str(e)}", 500)
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limiter.limit('login')
 def login():
     try:
         data = request.get_json()
@@ -101,7 +104,13 @@ def login():
             return error_response(f"密码解密失败: {str(e)}", 400)
         
         if user.check_password(plain_password):
-            access_token = create_access_token(identity=str(user.id))  # 转换为字符串
+            # 哈希迁移：首次校验通过时写入的 password_hash
+            if db.session.is_modified(user):
+                db.session.commit()
+            access_token = create_access_token(
+                identity=str(user.id),  # 转换为字符串
+                additional_claims={'is_admin': user.is_admin}
+            )
             user_data = {
                 "id": user.id,
                 "nickname": user.nickname,
@@ -1,6 +1,10 @@
-from flask import jsonify
+from flask import jsonify, request, current_app
 from flask.blueprints import Blueprint
 from app.models import Prize
+from app.catalog_cache import catalog_cache
+from app.image_uploads import image_uploads
+from app.pagination import PaginationError, keyset_page, parse_limit, parse_decimal
+from decimal import Decimal
 
 prizes_bp = Blueprint('prizes', __name__)
 
@@ -22,22 +26,72 @@ def error_response(message="操作失败", code=400, data=None):
     }
     return jsonify(response), code, {'Content-Type': 'application/json; charset=utf-8'}
 
+# 排序方式 -> 是否倒序；排序键固定为 (points, id)
+PRIZE_SORTS = {'points_asc': False, 'points_desc': True}
+
+def prize_to_dict(prize):
+    return {
+        "id": prize.id,
+        "name": prize.name,
+        "description": prize.description,
+        "image": prize.image,
+        "image_variants": image_uploads.variant_urls(prize.image),
+        "points": prize.points,
+        "category": prize.category,
+        "stock": prize.stock
+    }
+
+def query_prizes(args):
+    """
+    按 category / min_points / max_points 筛选奖品
+    传入 limit 或 cursor 时按 (points, id) 游标分页，返回 {"items": [...], "next_cursor": ...}；
+    否则返回完整列表（兼容旧客户端），指定 sort 时按积分排序
+    """
+    sort = args.get('sort')
+    if sort is not None and sort not in PRIZE_SORTS:
+        raise PaginationError("sort 仅支持 points_asc 或 points_desc")
+
+    query = Prize.query
+    category = args.get('category')
+    if category:
+        query = query.filter(Prize.category == category)
+    min_points = parse_decimal(args, 'min_points')
+    if min_points is not None:
+        query = query.filter(Prize.points >= min_points)
+    max_points = parse_decimal(args, 'max_points')
+    if max_points is not None:
+        query = query.filter(Prize.points <= max_points)
+
+    if 'limit' not in args and 'cursor' not in args:
+        if sort is None:
+            return [prize_to_dict(p) for p in query.order_by(Prize.id).all()]
+        descending = PRIZE_SORTS[sort]
+        order = [Prize.points.desc(), Prize.id.desc()] if descending else [Prize.points, Prize.id]
+        return [prize_to_dict(p) for p in query.order_by(*order).all()]
+
+    prizes, next_cursor = keyset_page(
+        query, [Prize.points, Prize.id], args.get('cursor'), parse_limit(args),
+        key_of=lambda p: [p.points, p.id],
+        descending=PRIZE_SORTS[sort or 'points_asc'],
+        cast=lambda values: [Decimal(values[0]), int(values[1])]
+    )
+    return {"items": [prize_to_dict(p) for p in prizes], "next_cursor": next_cursor}
+
 @prizes_bp.route('', methods=['GET'])
 @prizes_bp.route('/', methods=['GET'])
 def get_prizes():
     try:
-        prizes = Prize.query.all()
-        prizes_list = [
-            {
-                "id": prize.id,
-                "name": prize.name,
-                "description": prize.description,
-                "image": prize.image,
-                "points": prize.points,
-                "category": prize.category,
-                "stock": prize.stock
-            } for prize in prizes
-        ]
-        return success_response("获取奖品列表成功", prizes_list)
+        # 命中缓存时不查询数据库；ETag 未变化时返回 304，不传输响应体
+        args = request.args
+        body, etag = catalog_cache.get(
+            tuple(sorted(args.items())),
+            lambda: {"code": 200, "message": "获取奖品列表成功", "data": query_prizes(args)}
+        )
+        response = current_app.response_class(body, content_type='application/json; charset=utf-8')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.set_etag(etag)
+        return response.make_conditional(request)
+    except PaginationError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f"获取奖品列表失败: {str(e)}", 500)
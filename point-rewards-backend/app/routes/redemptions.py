@@ -2,7 +2,10 @@ from flask import request, jsonify
 from flask.blueprints import Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Redemption, User, Prize
+from app.models import Redemption, Prize
+from app.redemption import redeem, RedemptionError
+from app.pagination import PaginationError, keyset_page, parse_limit, parse_datetime
+from datetime import datetime, timedelta
 
 redemptions_bp = Blueprint('redemptions', __name__)
 
@@ -28,61 +31,90 @@ def error_response(message="操作失败", code=400, data=None):
 @jwt_required()
 def redeem_prize():
     try:
-        user_id = get_jwt_identity()
+        user_id = int(get_jwt_identity())
         data = request.get_json()
+        # 移动端以字符串传奖品ID；统一转为整数，热门奖品才能命中内存库存预占
         prize_id = data.get('prize_id')
+        if isinstance(prize_id, bool):
+            prize_id = None
+        try:
+            prize_id = int(prize_id)
+        except (TypeError, ValueError):
+            return error_response("奖品ID无效", 400)
         shipping_address = data.get('shipping_address')
 
-        user = User.query.get(user_id)
-        prize = Prize.query.get(prize_id)
-
-        if not prize:
-            return error_response("奖品不存在", 404)
-
-        if prize.stock <= 0:
-            return error_response("奖品库存不足", 400)
-
-        if user.points < prize.points:
-            return error_response("用户积分不足", 400)
-
-        # 执行兑换
-        user.points -= prize.points
-        prize.stock -= 1
-        
-        new_redemption = Redemption(
-            user_id=user.id,
-            prize_id=prize.id,
-            points_spent=prize.points,
-            shipping_address=shipping_address
-        )
-        
-        db.session.add(new_redemption)
-        db.session.commit()
+        # 条件更新扣减库存和积分，并发兑换时不会超卖
+        redeem(user_id, prize_id, shipping_address)
 
         return success_response("兑换成功")
+    except RedemptionError as e:
+        return error_response(e.message, e.code)
     except Exception as e:
         db.session.rollback()
         return error_response(f"兑换失败: {str(e)}", 500)
 
 
+def filter_redemptions(query, args):
+    """
+    按 from / to / status 筛选兑换记录
+    from 包含当天/当时；to 只给日期时包含当天整天，给到时间时包含该时刻
+    """
+    start = parse_datetime(args, 'from')
+    if start is not None:
+        query = query.filter(Redemption.created_at >= start)
+    end = parse_datetime(args, 'to')
+    if end is not None:
+        if len(args['to']) == 10:
+            query = query.filter(Redemption.created_at < end + timedelta(days=1))
+        else:
+            query = query.filter(Redemption.created_at <= end)
+    status = args.get('status')
+    if status:
+        query = query.filter(Redemption.status == status)
+    return query
+
+def list_redemptions(query, args, to_dict):
+    """
+    筛选后按创建时间倒序返回兑换记录
+    传入 limit 或 cursor 时按 (created_at, id) 游标分页，返回 {"items": [...], "next_cursor": ...}；
+    否则返回完整列表（兼容旧客户端）
+    """
+    query = filter_redemptions(query, args)
+    if 'limit' not in args and 'cursor' not in args:
+        rows = query.order_by(Redemption.created_at.desc(), Redemption.id.desc()).all()
+        return [to_dict(r) for r in rows]
+
+    rows, next_cursor = keyset_page(
+        query, [Redemption.created_at, Redemption.id], args.get('cursor'), parse_limit(args),
+        key_of=lambda r: [r.created_at, r.id],
+        descending=True,
+        cast=lambda values: [datetime.fromisoformat(values[0]), int(values[1])]
+    )
+    return {"items": [to_dict(r) for r in rows], "next_cursor": next_cursor}
+
 @redemptions_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_history():
     try:
-        user_id = get_jwt_identity()
-        redemptions = Redemption.query.filter_by(user_id=user_id).order_by(Redemption.created_at.desc()).all()
+        user_id = int(get_jwt_identity())
+        # 一次 JOIN 查询带出奖品名称，避免逐条懒加载
+        query = db.session.query(
+            Redemption.id, Prize.name.label('prize_name'), Redemption.points_spent,
+            Redemption.status, Redemption.created_at, Redemption.shipping_address
+        ).join(Prize, Redemption.prize_id == Prize.id) \
+            .filter(Redemption.user_id == user_id)
         
-        history_list = [
-            {
-                "id": r.id,
-                "prize_name": r.prize.name,
-                "points_spent": r.points_spent,
-                "status": r.status,
-                "created_at": r.created_at.isoformat(),
-                "shipping_address": r.shipping_address
-            } for r in redemptions
-        ]
+        history = list_redemptions(query, request.args, lambda r: {
+            "id": r.id,
+            "prize_name": r.prize_name,
+            "points_spent": r.points_spent,
+            "status": r.status,
+            "created_at": r.created_at.isoformat(),
+            "shipping_address": r.shipping_address
+        })
         
-        return success_response("获取兑换历史成功", history_list)
+        return success_response("获取兑换历史成功", history)
+    except PaginationError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f"获取兑换历史失败: {str(e)}", 500)
@@ -1,8 +1,11 @@
-from flask import jsonify, request
+import time
+
+from flask import jsonify, request, current_app
 from flask.blueprints import Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import User
 from app import db
+from app.points_feed import points_feed
 
 user_bp = Blueprint('user', __name__)
 
@@ -24,26 +27,97 @@ def error_response(message="操作失败", code=400, data=None):
     }
     return jsonify(response), code, {'Content-Type': 'application/json; charset=utf-8'}
 
+def _me_etag(user_id, version):
+    return f"u{user_id}-v{version}"
+
+def _me_response(user_id, row):
+    """row 为 (points, addresses, version)；响应带 ETag，客户端可用 If-None-Match 条件请求"""
+    # 只返回经常变化的核心信息，减少数据传输
+    user_data = {
+        "points": row.points,  # 积分（经常变化）
+        "addresses": row.addresses or [],  # 地址（可能变化）
+        "version": row.version
+    }
+    response, code, headers = success_response("获取用户信息成功", user_data)
+    response.headers.update(headers)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(_me_etag(user_id, row.version))
+    return response
+
+def _load_me(user_id):
+    return db.session.query(User.points, User.addresses, User.version).filter_by(id=user_id).first()
+
 @user_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_me():
     try:
         user_id = int(get_jwt_identity())  # 转换为整数
-        user = User.query.get(user_id)
-        if not user:
+
+        # 带 If-None-Match 时只查询版本号，未变化直接返回 304
+        if request.if_none_match:
+            version = db.session.query(User.version).filter_by(id=user_id).scalar()
+            if version is None:
+                return error_response("用户不存在", 404)
+            if request.if_none_match.contains(_me_etag(user_id, version)):
+                response = current_app.response_class(status=304)
+                response.set_etag(_me_etag(user_id, version))
+                return response
+
+        row = _load_me(user_id)
+        if not row:
             return error_response("用户不存在", 404)
-        
-        # 只返回经常变化的核心信息，减少数据传输
-        user_data = {
-            "points": user.points,  # 积分（经常变化）
-            "addresses": user.addresses or []  # 地址（可能变化）
-        }
-        
-        return success_response("获取用户信息成功", user_data)
+        return _me_response(user_id, row)
     
     except Exception as e:
         return error_response(f"获取用户信息失败: {str(e)}", 500)
 
+@user_bp.route('/me/changes', methods=['GET'])
+@jwt_required()
+def wait_me_changes():
+    """
+    长轮询积分/地址变化：?version=客户端当前版本号
+    版本号不同时立即返回最新信息；否则挂起至多 USER_FEED_TIMEOUT 秒，期间无变化返回 304
+    本进程挂起的请求已达 USER_FEED_MAX_WAITERS 时不挂起，无变化立即返回 304 并带 Retry-After
+    """
+    try:
+        user_id = int(get_jwt_identity())  # 转换为整数
+        try:
+            known_version = int(request.args.get('version', ''))
+        except ValueError:
+            return error_response("version 必须是整数", 400)
+
+        deadline = time.monotonic() + points_feed.timeout
+        listener = points_feed.listen(user_id)
+        if listener is None:
+            row = _load_me(user_id)
+            if not row:
+                return error_response("用户不存在", 404)
+            if row.version != known_version:
+                return _me_response(user_id, row)
+            response = current_app.response_class(status=304)
+            response.headers['Retry-After'] = str(int(points_feed.poll_interval))
+            return response
+
+        try:
+            while True:
+                row = _load_me(user_id)
+                if not row:
+                    return error_response("用户不存在", 404)
+                if row.version != known_version:
+                    return _me_response(user_id, row)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return current_app.response_class(status=304)
+                # 等待期间归还数据库连接，挂起的请求不占用连接池
+                db.session.close()
+                listener.wait(min(remaining, points_feed.poll_interval))
+        finally:
+            points_feed.unlisten(listener)
+
+    except Exception as e:
+        return error_response(f"获取用户信息失败: {str(e)}", 500)
+
 @user_bp.route('/address', methods=['PUT'])
 @jwt_required()
 def update_address():
@@ -61,7 +135,9 @@ def update_address():
 
         # 更新地址（这里简化为只存储一个地址字符串）
         user.addresses = [new_address]  # 存储为数组格式，方便以后扩展多地址
+        user.bump_version()
         db.session.commit()
+        points_feed.notify([user_id])
 
         user_data = {
             "id": user.id,
@@ -95,7 +171,9 @@ def update_addresses():
             return error_response("地址格式无效，必须是一个列表", 400)
 
         user.addresses = new_addresses
+        user.bump_version()
         db.session.commit()
+        points_feed.notify([user_id])
 
         user_data = {
             "id": user.id,
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 性能模式（SQLITE_PERFORMANCE_MODE，默认开启）
+- 每个新连接设置 PRAGMA：WAL 日志（读写互不阻塞）、synchronous=NORMAL（WAL 下断电只丢最近的提交，不会损坏）、
+  busy_timeout（写锁被占用时等待而不是立即报 database is locked）、mmap_size 与 cache_size
+- retry_on_busy：等待超时后仍拿不到写锁时回滚并按退避重试写事务
+其他数据库不受影响
+"""
+import functools
+import random
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import db
+
+BUSY_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def _pragmas(config, in_memory):
+    pragmas = [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('synchronous', 'NORMAL'),
+        # 负数表示 KiB
+        ('cache_size', -config['SQLITE_CACHE_SIZE']),
+    ]
+    if not in_memory:
+        pragmas = [('journal_mode', 'WAL'), ('mmap_size', config['SQLITE_MMAP_SIZE'])] + pragmas
+    return pragmas
+
+
+def init_app(app):
+    if not app.config['SQLITE_PERFORMANCE_MODE']:
+        return
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name != 'sqlite':
+            continue
+        in_memory = engine.url.database in (None, '', ':memory:')
+        pragmas = _pragmas(app.config, in_memory)
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record, pragmas=pragmas):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+
+def is_busy_error(error):
+    return isinstance(error, OperationalError) and any(m in str(error.orig).lower() for m in BUSY_MESSAGES)
+
+
+def retry_on_busy(func):
+    """
+    写事务遇到 SQLite 锁超时时回滚并重试（最多 SQLITE_BUSY_RETRIES 次，指数退避加随机抖动）
+    被装饰的函数应只包含写库事务本身（到 commit 为止），失败时不留下副作用，可以安全地整体重跑；
+    提交成功后的步骤（回写、通知、清缓存等）放在被装饰函数之外，避免重试时重复执行
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config['SQLITE_BUSY_RETRIES']
+        if db.engine.dialect.name != 'sqlite':
+            retries = 0
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_busy_error(e):
+                    raise
+                db.session.rollback()
+                time.sleep(random.uniform(0.01, 0.05) * 2 ** attempt)
+    return wrapper
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+上传文件访问 /static/uploads/<filename>
+- 上传文件名唯一（内容摘要或随机名），内容永不改变，响应带 Cache-Control: immutable 长期缓存
+- 由 werkzeug 处理 ETag / Last-Modified 条件请求（304）与 Range 分段请求（206）
+- UPLOAD_SENDFILE 可把文件发送交给前置服务器，Python worker 只做路径校验：
+  x-accel：返回 X-Accel-Redirect，需在 nginx 中配置对应的 internal location，例如
+      location /_uploads/ { internal; alias /opt/point-rewards/point-rewards-backend/static/uploads/; }
+  x-sendfile：返回 X-Sendfile（Apache mod_xsendfile / lighttpd）
+"""
+import mimetypes
+import os
+
+from flask import abort, current_app, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+SENDFILE_MODES = ('', 'x-accel', 'x-sendfile')
+
+
+def serve_upload(filename):
+    config = current_app.config
+    path = safe_join(config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mode = config['UPLOAD_SENDFILE']
+    if mode == 'x-accel':
+        # 条件请求与 Range 由 nginx 处理，这里只返回空响应体和缓存头
+        response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+    else:
+        response = send_file(
+            path,
+            request.environ,
+            conditional=True,
+            etag=True,
+            max_age=config['UPLOAD_CACHE_MAX_AGE'],
+            use_x_sendfile=mode == 'x-sendfile',
+            response_class=current_app.response_class
+        )
+    response.cache_control.public = True
+    response.cache_control.max_age = config['UPLOAD_CACHE_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    if app.config['UPLOAD_SENDFILE'] not in SENDFILE_MODES:
+        raise ValueError(f"UPLOAD_SENDFILE 仅支持 {', '.join(m for m in SENDFILE_MODES if m)}")
+    app.add_url_rule('/static/uploads/<filename>', 'uploaded_file', serve_upload)
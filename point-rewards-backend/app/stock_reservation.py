@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+热门奖品库存预占
+- 启用后（HOT_PRIZE_IDS），热门奖品的库存计数器预先从 Prize.stock 加载，兑换时在内存中原子扣减，
+  售罄请求直接拒绝，不再争抢 prize 行
+- 兑换记录照常写库，Prize.stock 则按批次回写：每累计 STOCK_FLUSH_BATCH 次确认，
+  用一条 UPDATE 扣减这段时间内新增兑换记录的数量
+- 热门奖品的兑换记录写入时标记为未回写（stock_synced=False），回写时逐条标记，可重复执行；
+  进程崩溃后 reconcile 会补齐未回写的部分
+- 默认的 LocalStockBackend 只在单个进程内有效，多进程部署需要换成共享后端（接口相同）
+"""
+import threading
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, update
+
+from app import db
+from app.models import Prize, Redemption
+from app.sqlite_profile import retry_on_busy
+
+
+class LocalStockBackend:
+    """进程内库存计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stock = {}
+
+    def load(self, prize_id, stock):
+        with self._lock:
+            self._stock[prize_id] = stock
+
+    def has(self, prize_id):
+        return prize_id in self._stock
+
+    def get(self, prize_id):
+        return self._stock.get(prize_id)
+
+    def take(self, prize_id):
+        """库存大于0时原子减1并返回 True，否则返回 False"""
+        with self._lock:
+            if self._stock.get(prize_id, 0) <= 0:
+                return False
+            self._stock[prize_id] -= 1
+            return True
+
+    def give_back(self, prize_id):
+        with self._lock:
+            if prize_id in self._stock:
+                self._stock[prize_id] += 1
+
+
+class StockReservations:
+    """热门奖品库存预占与批量回写"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalStockBackend()
+        self.hot_prize_ids = set()
+        self.flush_batch = 50
+        self._lock = threading.Lock()
+        # 加载计数器与预占互斥，避免重新加载时覆盖掉并发的扣减；加载过程中会再次进入（tracks -> reconcile）
+        self._load_lock = threading.RLock()
+        self._confirmed = {}
+        # 已预占、兑换记录尚未提交的数量
+        self._outstanding = {}
+
+    def init_app(self, app):
+        self.hot_prize_ids = set(app.config['HOT_PRIZE_IDS'])
+        self.flush_batch = app.config['STOCK_FLUSH_BATCH']
+        app.cli.add_command(reconcile_stock_command)
+
+    def tracks(self, prize_id):
+        """奖品是否走内存预占；首次访问时从数据库加载库存"""
+        if prize_id not in self.hot_prize_ids:
+            return False
+        if not self.backend.has(prize_id):
+            with self._load_lock:
+                if not self.backend.has(prize_id):
+                    self.reconcile(prize_id)
+        # 奖品不存在时交给普通兑换流程处理
+        return self.backend.has(prize_id)
+
+    def _settle(self, prize_id):
+        with self._lock:
+            self._outstanding[prize_id] = self._outstanding.get(prize_id, 0) - 1
+
+    def reserve(self, prize_id):
+        with self._load_lock:
+            if not self.backend.take(prize_id):
+                return False
+            with self._lock:
+                self._outstanding[prize_id] = self._outstanding.get(prize_id, 0) + 1
+        return True
+
+    def release(self, prize_id):
+        self.backend.give_back(prize_id)
+        self._settle(prize_id)
+
+    def confirm(self, prize_id):
+        """兑换记录已提交，累计到批次上限时回写 Prize.stock"""
+        self._settle(prize_id)
+        with self._lock:
+            confirmed = self._confirmed.get(prize_id, 0) + 1
+            self._confirmed[prize_id] = confirmed
+        if confirmed >= self.flush_batch:
+            self.flush(prize_id)
+
+    @retry_on_busy
+    def flush(self, prize_id):
+        """
+        把尚未回写的兑换记录一次性扣减到 Prize.stock，返回扣减数量
+        逐条标记已回写，晚提交的记录（ID 比已回写的小）留到下一次回写；并发回写时每条记录只会被其中一个标记
+        """
+        with self._lock:
+            self._confirmed[prize_id] = 0
+
+        synced = db.session.execute(
+            update(Redemption)
+            .where(Redemption.prize_id == prize_id, Redemption.stock_synced == db.false())
+            .values(stock_synced=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not synced:
+            db.session.rollback()
+            return 0
+
+        db.session.execute(
+            update(Prize)
+            .where(Prize.id == prize_id)
+            .values(stock=Prize.stock - synced)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return synced
+
+    def reconcile(self, prize_id):
+        """
+        补齐未回写的兑换记录，并用 Prize.stock 重置内存计数器，返回校正后的库存
+        重置期间暂停预占；已预占但尚未提交的数量从计数器中扣除，不会因重新加载而超卖
+        """
+        with self._load_lock:
+            if not db.session.query(Prize.id).filter_by(id=prize_id).first():
+                return None
+            self.flush(prize_id)
+            stock = db.session.query(Prize.stock).filter_by(id=prize_id).scalar()
+            if prize_id in self.hot_prize_ids:
+                # 回写之后才提交的兑换记录尚未计入 Prize.stock
+                unsynced = db.session.query(func.count(Redemption.id)).filter(
+                    Redemption.prize_id == prize_id, Redemption.stock_synced == db.false()
+                ).scalar()
+                with self._lock:
+                    outstanding = self._outstanding.get(prize_id, 0)
+                self.backend.load(prize_id, max(stock - unsynced - outstanding, 0))
+            db.session.commit()
+            return stock
+
+    def reconcile_all(self):
+        """对所有热门奖品以及仍有未回写兑换记录的奖品执行校正"""
+        unsynced = {
+            prize_id for (prize_id,) in
+            db.session.query(Redemption.prize_id).filter(Redemption.stock_synced == db.false()).distinct()
+        }
+        return {prize_id: self.reconcile(prize_id) for prize_id in sorted(unsynced | self.hot_prize_ids)}
+
+
+stock_reservations = StockReservations()
+
+
+@click.command('reconcile-stock')
+@with_appcontext
+def reconcile_stock_command():
+    """崩溃恢复：把未回写的兑换记录同步到 Prize.stock"""
+    for prize_id, stock in stock_reservations.reconcile_all().items():
+        click.echo(f'奖品 {prize_id}: 库存 {stock}')
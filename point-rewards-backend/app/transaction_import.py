@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""
+流水导入引擎
+- 按固定行数分块流式读取 Excel / CSV / Parquet / Arrow，内存占用与文件大小无关；
+  各格式的列约定与上传模板一致：第1列快手ID、第2列主播名称、第3列流水（CSV 与 Parquet/Arrow 只解析第1、3列）
+- 每块整列校验快手ID与流水、计算积分，不逐行调用 Python 转换
+- 每批只用一次 IN 查询解析快手ID，再用一次批量 UPDATE 写入积分
+- 返回结果与原接口一致：updated_count / not_found_count / total_processed / error_records，
+  另有 changed_count（积分实际发生变化的用户数）
+- 增量模式按周期保存每个快手ID上次导入的积分快照，重复上传时只写入变化的行
+- 同一文件中重复出现的快手ID只采用首次出现的行，其余行写入 error_records
+"""
+import codecs
+import os
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, update, bindparam
+
+from app import db
+from app.models import User, ImportSnapshot, ImportStaging
+from app.points_feed import points_feed
+from app.points_ledger import record_entries
+from app.sqlite_profile import retry_on_busy
+
+# 每批写库的行数（同时也是 IN 查询的参数个数，需低于数据库的绑定参数上限）
+CHUNK_SIZE = 1000
+
+# 每次读取并整列校验的行数
+PARSE_BLOCK_SIZE = 50000
+
+# 积分列（DECIMAL(10, 2)）的精度
+POINTS_QUANTUM = Decimal('0.01')
+
+# 导入模式：覆盖积分 / 与同一周期的上次导入比较，只加减差额
+MODE_OVERWRITE = 'overwrite'
+MODE_DELTA = 'delta'
+IMPORT_MODES = (MODE_OVERWRITE, MODE_DELTA)
+
+# 分块 DataFrame 的统一列：Excel 行号、快手ID、流水
+CHUNK_COLUMNS = ['row', 'kuaishou_id', 'transaction']
+
+
+class TransactionImportError(Exception):
+    """流水文件无法读取或格式不正确"""
+
+
+def _format_error(kind='Excel'):
+    return TransactionImportError(f"{kind}文件格式不正确，需要至少3列：快手ID、主播名称、流水")
+
+
+def _iter_xlsx_chunks(stream, chunk_size):
+    """使用 openpyxl 只读模式逐行读取 .xlsx，按块产出 DataFrame"""
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise TransactionImportError(f"读取Excel文件失败: {str(e)}")
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None or len(header) < 3:
+            raise _format_error()
+
+        # Excel行号从2开始（第1行是标题行）
+        numbered = (
+            (row_number, values[0], values[2] if len(values) > 2 else None)
+            for row_number, values in enumerate(rows, start=2)
+            if any(value is not None for value in values)
+        )
+        while True:
+            block = list(islice(numbered, chunk_size))
+            if not block:
+                break
+            # 使用 object 类型，避免含空值的整数快手ID被转换成浮点数
+            yield pd.DataFrame(block, columns=CHUNK_COLUMNS, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_chunks(stream, chunk_size):
+    """旧版 .xls 无法流式读取，整表读入后再按块切分"""
+    try:
+        df = pd.read_excel(stream, header=0)
+    except Exception as e:
+        raise TransactionImportError(f"读取Excel文件失败: {str(e)}")
+
+    if len(df.columns) < 3:
+        raise _format_error()
+
+    frame = pd.DataFrame({
+        'row': df.index + 2,
+        'kuaishou_id': df.iloc[:, 0],
+        'transaction': df.iloc[:, 2],
+    })
+    for start in range(0, len(frame), chunk_size):
+        yield frame.iloc[start:start + chunk_size]
+
+
+def _detect_csv_encoding(stream, sample_size=64 * 1024):
+    """UTF-8（含 BOM）优先；开头一段无法按 UTF-8 解码时按 GB18030（Excel 中文版导出的 CSV）读取"""
+    sample = stream.read(sample_size)
+    stream.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+
+def _iter_csv_chunks(stream, chunk_size):
+    """pandas C 解析器分块读取 CSV，只解析第1列（快手ID）和第3列（流水）"""
+    encoding = _detect_csv_encoding(stream)
+    try:
+        header = pd.read_csv(stream, encoding=encoding, nrows=0)
+        stream.seek(0)
+    except Exception as e:
+        raise TransactionImportError(f"读取CSV文件失败: {str(e)}")
+    if len(header.columns) < 3:
+        raise _format_error('CSV')
+
+    try:
+        reader = pd.read_csv(
+            stream,
+            encoding=encoding,
+            usecols=[0, 2],
+            dtype=str,
+            # 只有空单元格视为空值，快手ID "NA"、"null" 等按原样保留
+            keep_default_na=False,
+            na_values=[''],
+            # 保留空行，行号与文件中的行一致
+            skip_blank_lines=False,
+            chunksize=chunk_size,
+        )
+    except Exception as e:
+        raise TransactionImportError(f"读取CSV文件失败: {str(e)}")
+
+    # CSV行号从2开始（第1行是标题行）
+    next_row = 2
+    try:
+        for frame in reader:
+            chunk = pd.DataFrame({
+                'row': range(next_row, next_row + len(frame)),
+                'kuaishou_id': frame.iloc[:, 0].to_numpy(dtype=object),
+                'transaction': frame.iloc[:, 1].to_numpy(dtype=object),
+            })
+            next_row += len(frame)
+            # 与 Excel 一致：不计入空行
+            yield chunk[chunk['kuaishou_id'].notna() | chunk['transaction'].notna()]
+    except Exception as e:
+        raise TransactionImportError(f"读取CSV文件失败: {str(e)}")
+
+
+def _arrow_columns(schema, kind):
+    """列约定与模板一致：第1列快手ID、第3列流水；只读取这两列"""
+    if len(schema.names) < 3:
+        raise _format_error(kind)
+    return [schema.names[0], schema.names[2]]
+
+
+def _arrow_batch_frame(batch, next_row):
+    import pyarrow as pa
+
+    # 整数快手ID转成字符串，避免含空值时被 pandas 转成浮点数（123 -> 123.0）
+    kuaishou_ids = batch.column(0)
+    if not pa.types.is_string(kuaishou_ids.type) and not pa.types.is_large_string(kuaishou_ids.type):
+        kuaishou_ids = kuaishou_ids.cast(pa.string())
+    return pd.DataFrame({
+        'row': range(next_row, next_row + batch.num_rows),
+        'kuaishou_id': kuaishou_ids.to_pandas().to_numpy(dtype=object),
+        'transaction': batch.column(1).to_pandas().to_numpy(dtype=object),
+    })
+
+
+def _iter_parquet_chunks(stream, chunk_size):
+    """按列投影分批读取 Parquet，只读取快手ID与流水两列"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise TransactionImportError("读取Parquet文件需要安装 pyarrow")
+
+    try:
+        parquet_file = pq.ParquetFile(stream)
+        columns = _arrow_columns(parquet_file.schema_arrow, 'Parquet')
+        batches = parquet_file.iter_batches(batch_size=chunk_size, columns=columns)
+        next_row = 2
+        for batch in batches:
+            yield _arrow_batch_frame(batch, next_row)
+            next_row += batch.num_rows
+    except TransactionImportError:
+        raise
+    except Exception as e:
+        raise TransactionImportError(f"读取Parquet文件失败: {str(e)}")
+
+
+def _iter_arrow_chunks(stream, chunk_size):
+    """读取 Arrow IPC（Feather v2）文件，按记录批次投影出快手ID与流水两列"""
+    try:
+        import pyarrow.ipc as ipc
+    except ImportError:
+        raise TransactionImportError("读取Arrow文件需要安装 pyarrow")
+
+    try:
+        reader = ipc.open_file(stream)
+        columns = _arrow_columns(reader.schema, 'Arrow')
+        next_row = 2
+        for i in range(reader.num_record_batches):
+            record_batch = reader.get_batch(i).select(columns)
+            for start in range(0, record_batch.num_rows, chunk_size):
+                batch = record_batch.slice(start, chunk_size)
+                yield _arrow_batch_frame(batch, next_row)
+                next_row += batch.num_rows
+    except TransactionImportError:
+        raise
+    except Exception as e:
+        raise TransactionImportError(f"读取Arrow文件失败: {str(e)}")
+
+
+# 支持的流水文件扩展名及对应的读取方式
+_CHUNK_READERS = {
+    '.xlsx': _iter_xlsx_chunks,
+    '.xls': _iter_xls_chunks,
+    '.csv': _iter_csv_chunks,
+    '.parquet': _iter_parquet_chunks,
+    '.arrow': _iter_arrow_chunks,
+    '.feather': _iter_arrow_chunks,
+}
+TRANSACTION_FILE_EXTENSIONS = tuple(_CHUNK_READERS)
+
+
+def iter_transaction_chunks(stream, filename, chunk_size=CHUNK_SIZE):
+    """根据文件扩展名选择读取方式，按块产出 (row, kuaishou_id, transaction) 数据"""
+    extension = os.path.splitext(filename.lower())[1]
+    return _CHUNK_READERS.get(extension, _iter_xlsx_chunks)(stream, chunk_size)
+
+
+def _transaction_error(value):
+    """与逐行处理一致的错误原因；float() 能解析的值返回 (数值, None)"""
+    try:
+        return float(value), None
+    except Exception as e:
+        return None, f'数据处理错误: {str(e)}'
+
+
+def _parse_block(block, result, seen):
+    """
+    按列校验并计算积分，返回 {快手ID: (行号, 积分)}
+    seen 为整个文件已出现的 {快手ID: 行号}；重复出现的快手ID以首次出现的行为准，其余行记为错误
+    """
+    # 去掉快手ID为空的行，快手ID整列转字符串并去除首尾空白
+    present = block['kuaishou_id'].notna().to_numpy()
+    rows = block['row'].to_numpy(dtype='int64')[present]
+    raw_ids = block['kuaishou_id'].to_numpy(dtype=object)[present]
+    raw_transactions = block['transaction'].to_numpy(dtype=object)[present]
+    kuaishou_ids = pd.Series(raw_ids, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+
+    # 流水整列转数值，空值按0处理；转换失败的值再逐个用 float() 复核，保持原有错误信息
+    transactions = pd.to_numeric(pd.Series(raw_transactions, dtype=object), errors='coerce').to_numpy(dtype='float64', copy=True)
+    missing = pd.isna(raw_transactions)
+    transactions[missing] = 0
+    valid = np.ones(len(rows), dtype=bool)
+    for i in np.flatnonzero(np.isnan(transactions) & ~missing):
+        value, reason = _transaction_error(raw_transactions[i])
+        if reason is None:
+            transactions[i] = value
+        else:
+            valid[i] = False
+            result['error_records'].append({
+                'row': int(rows[i]),
+                'kuaishou_id': str(raw_ids[i]),
+                'reason': reason
+            })
+
+    # 跳过空的快手ID行
+    valid &= (kuaishou_ids != '') & (kuaishou_ids != 'nan')
+
+    # 重复的快手ID：块内用 duplicated，跨块查 seen（字典查找，不随文件增大变慢）；均以首次出现的行为准
+    candidates = np.flatnonzero(valid)
+    candidate_ids = kuaishou_ids[candidates]
+    duplicated = (
+        pd.Series(candidate_ids, dtype=object).duplicated(keep='first').to_numpy()
+        | np.fromiter((kuaishou_id in seen for kuaishou_id in candidate_ids), dtype=bool, count=len(candidate_ids))
+    )
+    if duplicated.any():
+        # 块内首次出现的行号（首次出现的行一定不是重复行）
+        in_block_first = dict(zip(candidate_ids[~duplicated].tolist(), rows[candidates[~duplicated]].tolist()))
+        for i in candidates[duplicated]:
+            kuaishou_id = kuaishou_ids[i]
+            result['error_records'].append({
+                'row': int(rows[i]),
+                'kuaishou_id': kuaishou_id,
+                'reason': f'快手ID重复（与第{seen.get(kuaishou_id, in_block_first.get(kuaishou_id))}行相同），已忽略'
+            })
+        valid[candidates[duplicated]] = False
+
+    # 计算积分：整列 流水 / 10，再按浮点数的最短十进制表示转 Decimal，与 Decimal(str(流水 / 10)) 一致
+    kuaishou_ids = kuaishou_ids[valid].tolist()
+    rows = rows[valid].tolist()
+    points = map(Decimal, map(str, (transactions[valid] / 10).tolist()))
+
+    seen.update(zip(kuaishou_ids, rows))
+    return dict(zip(kuaishou_ids, zip(rows, points)))
+
+
+def _apply_chunk(parsed, result, ref=None):
+    """一次 IN 查询解析用户，一次批量 UPDATE 覆盖积分并批量追加流水；返回涉及的用户ID"""
+    if not parsed:
+        return []
+
+    # 锁住本块涉及的用户行，保证写入流水的变化量基于最新余额
+    users_by_kid = {
+        kid: (user_id, points) for kid, user_id, points in
+        db.session.query(User.kuaishouId, User.id, User.points)
+        .filter(User.kuaishouId.in_(list(parsed)))
+        .with_for_update()
+        .all()
+    }
+
+    updates = []
+    ledger_entries = []
+    not_found = []
+    for kuaishou_id, (row_number, points) in parsed.items():
+        user_id, old_points = users_by_kid.get(kuaishou_id, (None, None))
+        if user_id is None:
+            not_found.append({
+                'row': row_number,
+                'kuaishou_id': kuaishou_id,
+                'reason': '用户不存在'
+            })
+            continue
+        # 按积分列精度取整，保证余额与流水变化量一致
+        new_points = points.quantize(POINTS_QUANTUM, rounding=ROUND_HALF_UP)
+        updates.append({'id': user_id, 'points': new_points})
+        result['updated_count'] += 1
+        if new_points != old_points:
+            ledger_entries.append({'user_id': user_id, 'delta': new_points - old_points, 'reason': 'import', 'ref': ref})
+
+    result['changed_count'] += len(ledger_entries)
+    record_entries(ledger_entries)
+    if updates:
+        # 只有积分确实变化的用户才 +1 版本号，重复导入同一份文件不会惊动客户端
+        users = User.__table__
+        db.session.execute(
+            update(users)
+            .where(users.c.id == bindparam('user_id'), users.c.points != bindparam('new_points'))
+            .values(points=bindparam('new_points'), version=users.c.version + 1),
+            [{'user_id': u['id'], 'new_points': u['points']} for u in updates]
+        )
+
+    result['not_found_count'] += len(not_found)
+    result['error_records'].extend(not_found)
+    return [u['id'] for u in updates]
+
+
+def _apply_chunk_delta(parsed, result, period, ref=None):
+    """
+    增量模式：与同一周期上次导入的快照比较，只给积分变化的用户加上差额，并更新快照
+    本次文件中没有出现的快手ID保持不变；返回积分变化的用户ID
+    """
+    if not parsed:
+        return []
+
+    # 先锁用户行再读快照，同一用户的并发导入按顺序看到最新快照
+    users_by_kid = dict(
+        db.session.query(User.kuaishouId, User.id)
+        .filter(User.kuaishouId.in_(list(parsed)))
+        .with_for_update()
+        .all()
+    )
+    previous = dict(
+        db.session.query(ImportSnapshot.kuaishou_id, ImportSnapshot.points)
+        .filter(ImportSnapshot.period == period, ImportSnapshot.kuaishou_id.in_(list(users_by_kid)))
+        .all()
+    )
+
+    adjustments = []
+    ledger_entries = []
+    snapshot_inserts = []
+    snapshot_updates = []
+    not_found = []
+    for kuaishou_id, (row_number, points) in parsed.items():
+        user_id = users_by_kid.get(kuaishou_id)
+        if user_id is None:
+            not_found.append({
+                'row': row_number,
+                'kuaishou_id': kuaishou_id,
+                'reason': '用户不存在'
+            })
+            continue
+        result['updated_count'] += 1
+
+        earned = points.quantize(POINTS_QUANTUM, rounding=ROUND_HALF_UP)
+        before = previous.get(kuaishou_id)
+        if before == earned:
+            continue
+
+        snapshot = {'period': period, 'kuaishou_id': kuaishou_id, 'points': earned, 'job_id': ref}
+        (snapshot_inserts if before is None else snapshot_updates).append(snapshot)
+
+        # 没有快照按 0 计，与预览一致；首次出现且积分为 0 时只记快照，不写流水、不改余额
+        diff = earned - (before or 0)
+        if diff == 0:
+            continue
+        adjustments.append({'user_id': user_id, 'diff': diff})
+        ledger_entries.append({'user_id': user_id, 'delta': diff, 'reason': 'import', 'ref': ref})
+
+    record_entries(ledger_entries)
+    if adjustments:
+        users = User.__table__
+        db.session.execute(
+            update(users)
+            .where(users.c.id == bindparam('user_id'))
+            .values(points=users.c.points + bindparam('diff'), version=users.c.version + 1),
+            adjustments
+        )
+    if snapshot_inserts:
+        db.session.execute(insert(ImportSnapshot), snapshot_inserts)
+    if snapshot_updates:
+        db.session.execute(update(ImportSnapshot), snapshot_updates)
+
+    result['changed_count'] += len(adjustments)
+    result['not_found_count'] += len(not_found)
+    result['error_records'].extend(not_found)
+    return [a['user_id'] for a in adjustments]
+
+
+@retry_on_busy
+def _commit_chunk(parsed, mode, period, ref):
+    """
+    写入一批并提交，返回 (积分变化的用户ID, 本批统计)
+    本批统计单独累计，提交成功后再并入总结果，SQLite 锁超时重试时不会重复计数
+    """
+    chunk_result = {'updated_count': 0, 'changed_count': 0, 'not_found_count': 0, 'error_records': []}
+    if mode == MODE_DELTA:
+        user_ids = _apply_chunk_delta(parsed, chunk_result, period, ref)
+    else:
+        user_ids = _apply_chunk(parsed, chunk_result, ref)
+    db.session.commit()
+    return user_ids, chunk_result
+
+
+@retry_on_busy
+def _commit_staging(staged, chunk_size):
+    for start in range(0, len(staged), chunk_size):
+        db.session.execute(insert(ImportStaging), staged[start:start + chunk_size])
+    db.session.commit()
+
+
+def import_transactions(stream, filename, chunk_size=CHUNK_SIZE, progress=None, ref=None,
+                        mode=MODE_OVERWRITE, period=None):
+    """
+    流式导入流水文件并更新用户积分
+    mode=overwrite：用 流水/10 覆盖积分；mode=delta：与同一 period 的上次导入比较，只加减差额
+    每块单独提交，避免长事务长时间持有写锁；读取或格式错误抛出 TransactionImportError
+    progress: 可选回调，每块提交后以当前统计结果调用一次
+    ref: 写入积分流水的关联ID（导入任务ID）
+    """
+    if mode not in IMPORT_MODES:
+        raise TransactionImportError(f"不支持的导入模式: {mode}")
+    if mode == MODE_DELTA and not period:
+        raise TransactionImportError("增量导入必须指定周期")
+
+    result = {
+        'updated_count': 0,
+        'changed_count': 0,
+        'not_found_count': 0,
+        'total_processed': 0,
+        'error_records': []
+    }
+
+    # 整个文件的快手ID索引，写库前识别跨块的重复行
+    seen = {}
+    # 按较大的块整列校验（摊薄 pandas 的固定开销），再按 chunk_size 分批写库
+    for block in iter_transaction_chunks(stream, filename, max(chunk_size, PARSE_BLOCK_SIZE)):
+        block_errors_start = len(result['error_records'])
+        processed_before = result['total_processed']
+        block_rows = block['row'].astype('int64').to_numpy()
+        items = list(_parse_block(block, result, seen).items())
+
+        for start in range(0, len(items), chunk_size):
+            parsed = dict(items[start:start + chunk_size])
+            user_ids, chunk_result = _commit_chunk(parsed, mode, period, ref)
+            for key in ('updated_count', 'changed_count', 'not_found_count'):
+                result[key] += chunk_result[key]
+            result['error_records'].extend(chunk_result['error_records'])
+            points_feed.notify(user_ids)
+
+            # 已处理行数：之前各块的行数 + 本块中行号不大于本批最后一行的行数
+            last_row = items[min(start + chunk_size, len(items)) - 1][1][0]
+            result['total_processed'] = processed_before + int(block_rows.searchsorted(last_row, side='right'))
+            if progress:
+                progress(result)
+
+        # 块内错误记录按Excel行号排序，保持与逐行处理相同的顺序
+        result['error_records'][block_errors_start:] = sorted(
+            result['error_records'][block_errors_start:], key=lambda record: record['row']
+        )
+        result['total_processed'] = processed_before + len(block)
+
+        if progress:
+            progress(result)
+
+    return result
+
+
+def stage_transactions(stream, filename, job_id, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    预览（dry run）：与正式导入相同的读取和校验，解析结果按批写入 import_staging，不修改任何用户数据
+    返回 total_processed / error_records；匹配与变化情况由 app.import_preview 按暂存数据计算
+    """
+    result = {'total_processed': 0, 'error_records': []}
+
+    seen = {}
+    for block in iter_transaction_chunks(stream, filename, max(chunk_size, PARSE_BLOCK_SIZE)):
+        block_errors_start = len(result['error_records'])
+        staged = [
+            {'job_id': job_id, 'row': row_number, 'kuaishou_id': kuaishou_id,
+             'points': points.quantize(POINTS_QUANTUM, rounding=ROUND_HALF_UP)}
+            for kuaishou_id, (row_number, points) in _parse_block(block, result, seen).items()
+        ]
+        _commit_staging(staged, chunk_size)
+
+        result['error_records'][block_errors_start:] = sorted(
+            result['error_records'][block_errors_start:], key=lambda record: record['row']
+        )
+        result['total_processed'] += len(block)
+        if progress:
+            progress(result)
+
+    return result
@@ -12,10 +12,60 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # 配置JWT密钥
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'a-super-secret-jwt-key'
-    # 确保SQLAlchemy使用UTF-8编码
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-        'connect_args': {'check_same_thread': False}
-    }
+    # 登录密码迁移为加盐哈希（true 开启）及哈希迭代次数（决定每次登录的 CPU 开销）
+    PASSWORD_HASH_MIGRATION = (os.environ.get('PASSWORD_HASH_MIGRATION') or '').lower() == 'true'
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS') or 100000)
+    # 管理员身份缓存有效期（秒）；缓存在每个 worker 进程内，其他进程的修改最多延迟一个 TTL 生效
+    ADMIN_CACHE_TTL = int(os.environ.get('ADMIN_CACHE_TTL') or 30)
+    # /api/user/me/changes 长轮询：单次最长等待秒数、回查数据库的间隔（兜底其他进程的变更）
+    USER_FEED_TIMEOUT = int(os.environ.get('USER_FEED_TIMEOUT') or 10)
+    USER_FEED_POLL_INTERVAL = float(os.environ.get('USER_FEED_POLL_INTERVAL') or 5)
+    # 每个 worker 进程同时挂起的长轮询请求上限，须小于 GUNICORN_THREADS；超出的请求不等待，立即返回
+    USER_FEED_MAX_WAITERS = int(os.environ.get('USER_FEED_MAX_WAITERS') or 2)
+    # 登录/注册限流：令牌桶 "次数/秒数"，分别按客户端IP和手机号计算
+    # 计数保存在每个 worker 进程内，gunicorn 多进程时实际允许的次数最多为配置值乘以进程数
+    RATE_LIMIT_ENABLED = (os.environ.get('RATE_LIMIT_ENABLED') or 'true').lower() == 'true'
+    AUTH_RATE_LIMIT_PER_IP = os.environ.get('AUTH_RATE_LIMIT_PER_IP') or '20/60'
+    AUTH_RATE_LIMIT_PER_PHONE = os.environ.get('AUTH_RATE_LIMIT_PER_PHONE') or '5/60'
+    # 服务前面的可信代理层数：默认 1（deploy.sh 的 nginx），取 X-Forwarded-For 倒数第 N 项作为客户端IP；
+    # 直接对外提供服务、没有代理时必须设为 0，否则客户端可以伪造 X-Forwarded-For
+    RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS') or 1)
+    # 流水导入每块处理的行数
+    TRANSACTION_IMPORT_CHUNK_SIZE = int(os.environ.get('TRANSACTION_IMPORT_CHUNK_SIZE') or 1000)
+    # 流水导入后台线程数
+    IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS') or 2)
+    # 未完成的导入任务超过多少分钟没有进度更新即判定为中断（worker 重启或崩溃），标记为失败
+    IMPORT_JOB_STALE_MINUTES = int(os.environ.get('IMPORT_JOB_STALE_MINUTES') or 10)
+    # 导入预览暂存数据的保留小时数，过期后在下次预览时清理
+    IMPORT_PREVIEW_RETENTION_HOURS = int(os.environ.get('IMPORT_PREVIEW_RETENTION_HOURS') or 24)
+    # 走内存库存预占的热门奖品ID（逗号分隔），本地计数器仅适用于单进程部署（gunicorn 多进程时拒绝启动）
+    HOT_PRIZE_IDS = [int(i) for i in (os.environ.get('HOT_PRIZE_IDS') or '').split(',') if i.strip()]
+    # 热门奖品每确认多少次兑换回写一次 Prize.stock
+    STOCK_FLUSH_BATCH = int(os.environ.get('STOCK_FLUSH_BATCH') or 50)
+    # 奖品目录缓存有效期（秒）与最大条目数；缓存在每个 worker 进程内，其他进程的修改最多延迟一个 TTL 可见
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL') or 60)
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES') or 256)
+    # 上传文件目录；图片缩放版本的后台线程数与压缩质量
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or \
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static', 'uploads')
+    IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS') or 2)
+    IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY') or 82)
+    # 上传文件的浏览器缓存秒数（文件名唯一，默认一年）
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get('UPLOAD_CACHE_MAX_AGE') or 31536000)
+    # 上传文件交给前置服务器发送：留空由 Python 发送，x-accel（nginx）或 x-sendfile
+    UPLOAD_SENDFILE = (os.environ.get('UPLOAD_SENDFILE') or '').lower()
+    UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX') or '/_uploads/'
+    # SQLite 性能模式：WAL、synchronous=NORMAL、锁等待毫秒数、mmap 字节数、页缓存 KiB，写事务锁超时后的重试次数
+    SQLITE_PERFORMANCE_MODE = (os.environ.get('SQLITE_PERFORMANCE_MODE') or 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or 64 * 1024)
+    SQLITE_BUSY_RETRIES = int(os.environ.get('SQLITE_BUSY_RETRIES') or 3)
+    # 连接池参数默认按数据库类型选择（见 app.db_pool.POOL_PROFILES），设置以下环境变量时覆盖；
+    # 直接定义 SQLALCHEMY_ENGINE_OPTIONS 时完全使用自定义配置
+    DB_POOL_SIZE = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    DB_POOL_TIMEOUT = float(os.environ['DB_POOL_TIMEOUT']) if os.environ.get('DB_POOL_TIMEOUT') else None
+    DB_POOL_RECYCLE = int(os.environ['DB_POOL_RECYCLE']) if os.environ.get('DB_POOL_RECYCLE') else None
+    DB_POOL_PRE_PING = (os.environ['DB_POOL_PRE_PING'].lower() == 'true') if os.environ.get('DB_POOL_PRE_PING') else None
 
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 生产配置：gunicorn -c gunicorn.conf.py wsgi:app
+- 多进程 + 线程（gthread），进程数默认按 CPU 核数计算，均可通过环境变量调整
+- 平滑重载：kill -HUP <master pid> 逐个替换 worker，旧 worker 处理完当前请求再退出
+- 预加载应用时，fork 之后丢弃从 master 继承的数据库连接池，每个 worker 建立自己的连接
+进程内状态不在 worker 之间共享：
+- HOT_PRIZE_IDS 的内存库存计数器各进程各扣各的会超卖，设置了 HOT_PRIZE_IDS 且进程数大于1时拒绝启动
+- 登录/注册限流按进程计数，实际允许的次数最多是配置值乘以进程数
+- 奖品目录缓存、管理员身份缓存只在处理修改请求的进程内立即失效，其他进程最多延迟一个 TTL
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND') or '127.0.0.1:5000'
+
+# 进程数：默认 2 * 核数 + 1；每个进程的线程数
+# 线程预算：长轮询 /api/user/me/changes 每个进程最多占 USER_FEED_MAX_WAITERS 个线程（默认 2），
+# 每个最长 USER_FEED_TIMEOUT 秒（默认 10），其余 threads - USER_FEED_MAX_WAITERS 个线程只处理普通请求
+workers = int(os.environ.get('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS') or 8)
+
+# 请求超时须大于 USER_FEED_TIMEOUT；keep-alive 与 nginx 的 upstream 连接复用配合
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 60)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE') or 5)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT') or 30)
+
+# 处理一定数量请求后重启 worker（默认 0 不重启）；jitter 避免所有 worker 同时重启
+# 导入任务在 worker 进程内的线程池执行，重启会中断进行中的导入：worker_exit 会等待任务完成，
+# 但 gunicorn 最多再等 GUNICORN_TIMEOUT（重载/停止时为 GUNICORN_GRACEFUL_TIMEOUT）秒就强制结束进程，
+# 大文件导入可能超过这个时间；被中断的任务在心跳超时后标记为失败，需重新上传
+# 开启前确认内存确实在增长，并尽量在没有导入任务的时段重启
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 0)
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or 1000)
+
+# 在 master 中预加载应用，fork 后共享只读内存、启动更快；代码更新需完整重启而非 HUP
+preload_app = (os.environ.get('GUNICORN_PRELOAD') or '').lower() == 'true'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or '-'
+errorlog = os.environ.get('GUNICORN_ERROR_LOG') or '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL') or 'info'
+
+
+def on_starting(server):
+    from config import Config
+
+    if Config.HOT_PRIZE_IDS and server.cfg.workers > 1:
+        raise RuntimeError(
+            f"HOT_PRIZE_IDS 的库存计数器只在单个进程内有效，当前进程数为 {server.cfg.workers}；"
+            "请设置 GUNICORN_WORKERS=1，或取消 HOT_PRIZE_IDS"
+        )
+
+
+def post_fork(server, worker):
+    """子进程不能复用父进程打开的数据库连接，丢弃连接池（不关闭，避免影响父进程的连接）"""
+    from wsgi import app
+    from app import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """worker 退出前等待进程内的导入任务完成，避免重启时中断导入"""
+    from app.import_jobs import shutdown_executor
+
+    shutdown_executor()
@@ -0,0 +1,48 @@
+"""Track stock sync per redemption
+
+Revision ID: 7e2b4d9c1a35
+Revises: 3d7a0c5e8b61
+Create Date: 2025-09-05 09:26:51.184302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b4d9c1a35'
+down_revision = '3d7a0c5e8b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('redemption', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock_synced', sa.Boolean(), server_default=sa.true(), nullable=False))
+        batch_op.create_index('ix_redemption_prize_id_stock_synced', ['prize_id', 'stock_synced'], unique=False)
+
+    # 水位之后的热门奖品兑换记录尚未计入库存
+    op.execute(
+        "UPDATE redemption SET stock_synced = false WHERE EXISTS ("
+        "SELECT 1 FROM stock_sync WHERE stock_sync.prize_id = redemption.prize_id "
+        "AND redemption.id > stock_sync.last_redemption_id)"
+    )
+    op.drop_table('stock_sync')
+
+
+def downgrade():
+    op.create_table('stock_sync',
+    sa.Column('prize_id', sa.Integer(), nullable=False),
+    sa.Column('last_redemption_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['prize_id'], ['prize.id'], ),
+    sa.PrimaryKeyConstraint('prize_id')
+    )
+    # 以最早一条未回写记录之前的ID作为水位
+    op.execute(
+        "INSERT INTO stock_sync (prize_id, last_redemption_id) "
+        "SELECT prize_id, MIN(id) - 1 FROM redemption WHERE stock_synced = false GROUP BY prize_id"
+    )
+
+    with op.batch_alter_table('redemption', schema=None) as batch_op:
+        batch_op.drop_index('ix_redemption_prize_id_stock_synced')
+        batch_op.drop_column('stock_synced')
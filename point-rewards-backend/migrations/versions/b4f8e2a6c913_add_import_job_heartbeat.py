@@ -0,0 +1,29 @@
+"""Add import_job heartbeat
+
+Revision ID: b4f8e2a6c913
+Revises: 7e2b4d9c1a35
+Create Date: 2025-09-05 14:02:18.560417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f8e2a6c913'
+down_revision = '7e2b4d9c1a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('import_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+    # 已有任务以完成时间（未完成的以创建时间）作为最后一次心跳
+    op.execute("UPDATE import_job SET heartbeat_at = COALESCE(finished_at, created_at)")
+
+
+def downgrade():
+    with op.batch_alter_table('import_job', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
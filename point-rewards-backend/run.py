@@ -1,6 +1,9 @@
+import os
+
 from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
+    # 仅用于本地开发；生产环境使用 gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(debug=(os.environ.get('FLASK_DEBUG') or 'true').lower() == 'true', host='0.0.0.0')
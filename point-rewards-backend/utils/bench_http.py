@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 压测脚本：启动真实的服务进程，对登录、奖品目录、兑换三个接口分别压测，输出吞吐量与延迟分位数
+- gunicorn：生产配置（gunicorn.conf.py），进程数/线程数见 --workers / --threads
+- werkzeug：开发服务器（单进程多线程），用于对比
+默认使用临时 SQLite 数据库；--database-url 可指定 PostgreSQL 等（会清空其中的表）
+使用方法：python utils/bench_http.py [--server gunicorn] [--workers 4] [--threads 8]
+                                      [--requests 2000] [--concurrency 32] [--scenarios login,catalog,redeem]
+                                      [--sqlite-profile on|off]
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+PASSWORD = 'bench-password'
+SCENARIOS = ('login', 'catalog', 'redeem')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='HTTP 接口压测')
+    parser.add_argument('--server', choices=('gunicorn', 'werkzeug'), default='gunicorn', help='服务进程类型')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn 进程数')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn 每个进程的线程数')
+    parser.add_argument('--requests', type=int, default=2000, help='每个场景的请求数')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发连接数')
+    parser.add_argument('--users', type=int, default=1000, help='用户数')
+    parser.add_argument('--prizes', type=int, default=50, help='奖品数')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='压测场景，逗号分隔')
+    parser.add_argument('--database-url', default=None, help='数据库连接串，默认使用临时 SQLite 文件')
+    parser.add_argument('--sqlite-profile', choices=('on', 'off'), default='on',
+                        help='服务进程是否开启 SQLite 性能模式（WAL、busy_timeout 等）')
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知场景: {', '.join(sorted(unknown))}")
+    return args
+
+
+def seed(database_url, args):
+    """建表并写入用户与奖品，返回 (用户手机号列表, 兑换用的 token 列表, 奖品ID列表)"""
+    os.environ['DATABASE_URL'] = database_url
+    # journal_mode=WAL 会写入数据库文件，建库时须与服务进程保持一致
+    os.environ['SQLITE_PERFORMANCE_MODE'] = 'true' if args.sqlite_profile == 'on' else 'false'
+    from sqlalchemy import insert
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.models import User, Prize
+    from app.encryption import encrypt_password
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        encrypted = encrypt_password(PASSWORD)
+        db.session.execute(insert(User), [
+            {'nickname': f'bench{i}', 'kuaishouId': f'bench{i}', 'phone': f'1{i:010d}',
+             'password_encrypted': encrypted, 'points': Decimal(args.requests), 'addresses': [], 'is_admin': False}
+            for i in range(args.users)
+        ])
+        db.session.execute(insert(Prize), [
+            {'name': f'压测奖品{i}', 'description': '', 'image': '', 'points': Decimal('1.00'),
+             'category': f'分类{i % 5}', 'stock': args.requests * 10}
+            for i in range(args.prizes)
+        ])
+        db.session.commit()
+
+        users = db.session.query(User.id, User.phone).all()
+        tokens = [create_access_token(identity=str(user_id)) for user_id, _ in users]
+        prize_ids = [prize_id for (prize_id,) in db.session.query(Prize.id)]
+    return [phone for _, phone in users], tokens, prize_ids
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, database_url, port):
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        # 压测来自同一个IP，关闭限流
+        RATE_LIMIT_ENABLED='false',
+        SQLITE_PERFORMANCE_MODE='true' if args.sqlite_profile == 'on' else 'false',
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_ACCESS_LOG=os.devnull,
+        FLASK_DEBUG='false',
+    )
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'wsgi', 'run', '--port', str(port), '--no-reload']
+    process = subprocess.Popen(command, cwd=project_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("服务进程启动失败")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/api/prizes')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("等待服务进程启动超时")
+
+
+def build_requests(scenario, phones, tokens, prize_ids, count):
+    """预先生成 (方法, 路径, 请求体, 请求头) 列表，压测时不做额外计算"""
+    from app.encryption import encrypt_password
+
+    requests = []
+    for i in range(count):
+        if scenario == 'login':
+            # 与前端一致：密码在传输前加密
+            body = {'phone': random.choice(phones), 'password': encrypt_password(PASSWORD)}
+            requests.append(('POST', '/api/auth/login', json.dumps(body), {'Content-Type': 'application/json'}))
+        elif scenario == 'catalog':
+            requests.append(('GET', '/api/prizes', None, {}))
+        else:
+            body = {'prize_id': random.choice(prize_ids), 'shipping_address': 'bench'}
+            requests.append(('POST', '/api/redemptions/redeem', json.dumps(body), {
+                'Content-Type': 'application/json', 'Authorization': f'Bearer {tokens[i % len(tokens)]}'
+            }))
+    return requests
+
+
+def run_scenario(port, requests, concurrency):
+    """每个线程保持一个 keep-alive 连接，返回 (各请求延迟秒数, 非 2xx 次数, 总耗时)"""
+    local = threading.local()
+
+    def send(request):
+        method, path, body, headers = request
+        started = time.perf_counter()
+        for attempt in range(2):
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # 服务端关闭了空闲连接（如 worker 到达 max_requests 重启），重连后重试一次
+                connection.close()
+                local.connection = None
+                if attempt:
+                    return time.perf_counter() - started, False
+        return time.perf_counter() - started, 200 <= response.status < 300
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, requests))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in results], sum(1 for _, ok in results if not ok), elapsed
+
+
+def percentile(sorted_values, p):
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    print(f"写入 {args.users} 个用户、{args.prizes} 个奖品...")
+    phones, tokens, prize_ids = seed(database_url, args)
+
+    port = free_port()
+    process = start_server(args, database_url, port)
+    try:
+        results = []
+        for scenario in args.scenarios:
+            requests = build_requests(scenario, phones, tokens, prize_ids, args.requests)
+            latencies, errors, elapsed = run_scenario(port, requests, args.concurrency)
+            latencies.sort()
+            results.append((scenario, errors, elapsed, latencies))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    server = f"gunicorn {args.workers}x{args.threads}" if args.server == 'gunicorn' else 'werkzeug'
+    print(f"数据库: {database_url}  SQLite 性能模式: {args.sqlite_profile}")
+    print(f"服务: {server}  每场景请求数: {args.requests}  并发: {args.concurrency}")
+    print(f"{'场景':<10}{'失败':>8}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for scenario, errors, elapsed, latencies in results:
+        print(f"{scenario:<10}{errors:>8}{len(latencies) / elapsed:>10.1f}"
+              f"{percentile(latencies, 0.50) * 1000:>10.1f}{percentile(latencies, 0.99) * 1000:>10.1f}"
+              f"{latencies[-1] * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
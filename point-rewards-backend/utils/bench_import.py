@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水导入压测脚本：对比逐行校验与按列校验的耗时，并核对两者结果完全一致
+- 生成指定行数的流水数据（含空ID、非数字流水、重复快手ID等脏数据）
+- 逐行方式按写库批次（--chunk-size）切分，按列方式按读取块（PARSE_BLOCK_SIZE）切分
+- --end-to-end 时按 --formats 生成 .xlsx / .csv / .parquet / .feather 文件，
+  分别统计只读取的耗时，并在临时 SQLite 库上完整执行一次 import_transactions
+使用方法：python utils/bench_import.py [--rows 500000] [--chunk-size 1000] [--end-to-end] [--formats xlsx,csv,parquet]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def legacy_parse_block(chunk, result, seen):
+    """改造前的逐行校验（含重复快手ID检测）"""
+    parsed = {}
+    for row in chunk.itertuples(index=False):
+        try:
+            if pd.isna(row.kuaishou_id):
+                continue
+            kuaishou_id = str(row.kuaishou_id).strip()
+            transaction = float(row.transaction) if pd.notna(row.transaction) else 0
+
+            if not kuaishou_id or kuaishou_id == 'nan':
+                continue
+
+            first_row = seen.get(kuaishou_id)
+            if first_row is not None:
+                result['error_records'].append({
+                    'row': int(row.row),
+                    'kuaishou_id': kuaishou_id,
+                    'reason': f'快手ID重复（与第{first_row}行相同），已忽略'
+                })
+                continue
+
+            points = Decimal(str(transaction / 10))
+            seen[kuaishou_id] = int(row.row)
+            parsed[kuaishou_id] = (int(row.row), points)
+        except Exception as e:
+            result['error_records'].append({
+                'row': int(row.row),
+                'kuaishou_id': str(row.kuaishou_id),
+                'reason': f'数据处理错误: {str(e)}'
+            })
+    return parsed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='流水导入校验耗时压测')
+    parser.add_argument('--rows', type=int, default=500000, help='流水行数')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每块行数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--end-to-end', action='store_true', help='按 --formats 生成文件并各完整执行一次导入')
+    parser.add_argument('--formats', default='xlsx,csv,parquet', help='完整导入的文件格式：xlsx,csv,parquet,feather')
+    return parser.parse_args()
+
+
+def generate_rows(args):
+    """约 1% 的脏数据：空ID、空白ID、非数字流水、空流水、重复快手ID、整数快手ID"""
+    rng = random.Random(args.seed)
+    rows = []
+    for i in range(args.rows):
+        kuaishou_id = f'ks{i}'
+        transaction = round(rng.uniform(0, 100000), rng.choice([0, 1, 2]))
+        roll = rng.random()
+        if roll < 0.002:
+            kuaishou_id = None
+        elif roll < 0.003:
+            kuaishou_id = '   '
+        elif roll < 0.005:
+            transaction = rng.choice(['abc', '1,000', '--'])
+        elif roll < 0.006:
+            transaction = None
+        elif roll < 0.008:
+            kuaishou_id = f'ks{rng.randrange(max(1, i))}'
+        elif roll < 0.009:
+            kuaishou_id = 10000000 + i
+        elif roll < 0.010:
+            transaction = str(transaction)
+        rows.append((i + 2, kuaishou_id, transaction))
+    return rows
+
+
+def chunks_of(rows, chunk_size):
+    from app.transaction_import import CHUNK_COLUMNS
+
+    return [
+        pd.DataFrame(rows[start:start + chunk_size], columns=CHUNK_COLUMNS, dtype=object)
+        for start in range(0, len(rows), chunk_size)
+    ]
+
+
+def time_parse(parse, chunks):
+    result = {'error_records': []}
+    seen = {}
+    parsed = {}
+    started = time.perf_counter()
+    for chunk in chunks:
+        parsed.update(parse(chunk, result, seen))
+    elapsed = time.perf_counter() - started
+    errors = sorted(result['error_records'], key=lambda record: record['row'])
+    return parsed, errors, elapsed
+
+
+def write_file(rows, file_format):
+    """按指定格式写出流水文件；Parquet/Arrow 列类型固定，非数字流水写为空值"""
+    output = io.BytesIO()
+    if file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['快手ID', '主播名称', '流水'])
+        for _, kuaishou_id, transaction in rows:
+            sheet.append([kuaishou_id, '', transaction])
+        workbook.save(output)
+    elif file_format == 'csv':
+        frame = pd.DataFrame([(k, '', t) for _, k, t in rows], columns=['快手ID', '主播名称', '流水'])
+        output.write(frame.to_csv(index=False).encode('utf-8-sig'))
+    else:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        table = pa.table({
+            '快手ID': pa.array([None if k is None else str(k) for _, k, _ in rows], pa.string()),
+            '主播名称': pa.array([''] * len(rows), pa.string()),
+            '流水': pa.array([t if isinstance(t, float) else None for _, _, t in rows], pa.float64()),
+        })
+        if file_format == 'parquet':
+            pq.write_table(table, output)
+        else:
+            feather.write_feather(table, output)
+    output.seek(0)
+    return output
+
+
+def end_to_end(rows, args):
+    """每种格式在新的临时 SQLite 库上完整执行一次 import_transactions"""
+    from sqlalchemy import insert
+    from config import Config
+    from app import create_app, db
+    from app.models import User
+    from app.transaction_import import import_transactions, iter_transaction_chunks
+
+    print(f"{'格式':<10}{'读取(s)':>10}{'完整导入(s)':>14}{'更新':>10}{'错误':>8}")
+    for file_format in args.formats.split(','):
+        output = write_file(rows, file_format)
+        filename = f'bench.{file_format}'
+
+        # 只读取不写库的耗时
+        started = time.perf_counter()
+        for _ in iter_transaction_chunks(output, filename, args.chunk_size):
+            pass
+        read_elapsed = time.perf_counter() - started
+        output.seek(0)
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            users = [
+                {'nickname': f'bench{i}', 'kuaishouId': f'ks{i}', 'phone': f'1{i:010d}', 'password_encrypted': 'x',
+                 'points': Decimal('10.00'), 'addresses': [], 'is_admin': False}
+                for i in range(len(rows))
+            ]
+            for start in range(0, len(users), 10000):
+                db.session.execute(insert(User), users[start:start + 10000])
+            db.session.commit()
+
+            started = time.perf_counter()
+            result = import_transactions(output, filename, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - started
+        print(f"{file_format:<10}{read_elapsed:>10.2f}{elapsed:>14.2f}"
+              f"{result['updated_count']:>10}{len(result['error_records']):>8}")
+
+
+def main():
+    args = parse_args()
+    from app.transaction_import import _parse_block, PARSE_BLOCK_SIZE
+
+    print(f"生成 {args.rows} 行流水...")
+    rows = generate_rows(args)
+    # 两种方式使用各自的块大小：逐行方式与改造前一致按写库批次校验，按列方式按读取块整列校验
+    legacy = time_parse(legacy_parse_block, chunks_of(rows, args.chunk_size))
+    vectorized = time_parse(_parse_block, chunks_of(rows, PARSE_BLOCK_SIZE))
+
+    print(f"{'方式':<12}{'耗时(s)':>10}{'行/秒':>14}{'有效行':>10}{'错误':>8}")
+    for name, (parsed, errors, elapsed) in (('逐行', legacy), ('按列', vectorized)):
+        print(f"{name:<12}{elapsed:>10.2f}{args.rows / elapsed:>14.0f}{len(parsed):>10}{len(errors):>8}")
+
+    if legacy[0] == vectorized[0] and legacy[1] == vectorized[1]:
+        print("✅ 两种方式的积分与错误报告完全一致")
+    else:
+        print("❌ 结果不一致")
+        sys.exit(1)
+
+    if args.end_to_end:
+        end_to_end(rows, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录压测脚本：在大用户量数据库上对比不同凭证校验方式的登录吞吐量
+- legacy：旧实现，每次解密都重新计算密钥的 SHA-256 摘要，普通字符串比较
+- cached_digest：当前实现，SHA-256 摘要只计算一次，每次解密仍新建 AES 对象 + 常量时间比较
+- hashed：开启哈希迁移后的 PBKDF2 校验（迭代次数见 --iterations）
+使用方法：python utils/bench_login.py [--users 100000] [--logins 2000] [--iterations 100000]
+"""
+import argparse
+import base64
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+PASSWORD = 'bench-password'
+
+
+def legacy_decrypt_password(encrypted_password):
+    """改造前的解密实现"""
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import unpad
+
+    key = hashlib.sha256('eternalmoon'.encode()).digest()
+    encrypted_data = base64.b64decode(encrypted_password.encode())
+    cipher = AES.new(key, AES.MODE_CBC, encrypted_data[:16])
+    return unpad(cipher.decrypt(encrypted_data[16:]), AES.block_size).decode()
+
+
+def legacy_verify_password(user, plain_password):
+    """改造前的 User.check_password"""
+    try:
+        return legacy_decrypt_password(user.password_encrypted) == plain_password
+    except Exception:
+        return False
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='登录吞吐量压测')
+    parser.add_argument('--users', type=int, default=100000, help='数据库中的用户数')
+    parser.add_argument('--logins', type=int, default=2000, help='每种方式的登录次数')
+    parser.add_argument('--iterations', type=int, default=100000, help='hashed 方式的 PBKDF2 迭代次数')
+    return parser.parse_args()
+
+
+def build_app(args):
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        PASSWORD_HASH_ITERATIONS = args.iterations
+        # 压测来自同一个IP，关闭限流
+        RATE_LIMIT_ENABLED = False
+
+    return create_app(BenchConfig)
+
+
+def seed(app, args):
+    """批量写入用户；所有用户使用同一个加密密码，不影响单次校验的开销"""
+    from sqlalchemy import insert
+    from app import db
+    from app.models import User
+    from app.encryption import encrypt_password
+
+    with app.app_context():
+        db.create_all()
+        encrypted = encrypt_password(PASSWORD)
+        batch = []
+        for i in range(args.users):
+            batch.append({
+                'nickname': f'bench{i}', 'kuaishouId': f'bench{i}', 'phone': f'1{i:010d}',
+                'password_encrypted': encrypted, 'points': Decimal('10.00'), 'addresses': [], 'is_admin': False
+            })
+            if len(batch) >= 10000:
+                db.session.execute(insert(User), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(User), batch)
+        db.session.commit()
+
+
+def enable_hashes(app):
+    """模拟全部用户已完成哈希迁移"""
+    from app import db
+    from app.models import User
+    from app.credentials import hash_password
+
+    with app.app_context():
+        app.config['PASSWORD_HASH_MIGRATION'] = True
+        User.query.update({User.password_hash: hash_password(PASSWORD)})
+        db.session.commit()
+
+
+def run(app, args):
+    """随机挑选用户登录，返回 (成功次数, 耗时)"""
+    from app.encryption import encrypt_password
+
+    client = app.test_client()
+    # 与前端一致：密码在传输前加密，服务端会先解密请求中的密码
+    payloads = [
+        {'phone': f'1{random.randrange(args.users):010d}', 'password': encrypt_password(PASSWORD)}
+        for _ in range(args.logins)
+    ]
+
+    succeeded = 0
+    started = time.perf_counter()
+    for payload in payloads:
+        if client.post('/api/auth/login', json=payload).status_code == 200:
+            succeeded += 1
+    return succeeded, time.perf_counter() - started
+
+
+def main():
+    args = parse_args()
+    app = build_app(args)
+    print(f"写入 {args.users} 个用户...")
+    seed(app, args)
+
+    import app.models as models
+    import app.routes.auth as auth
+
+    results = []
+
+    # 旧实现：替换模型与路由中使用的校验/解密函数
+    current_verify, current_decrypt = models.verify_password, auth.decrypt_password
+    models.verify_password, auth.decrypt_password = legacy_verify_password, legacy_decrypt_password
+    results.append(('legacy',) + run(app, args))
+    models.verify_password, auth.decrypt_password = current_verify, current_decrypt
+
+    results.append(('cached_digest',) + run(app, args))
+
+    enable_hashes(app)
+    results.append((f'hashed({args.iterations})',) + run(app, args))
+
+    print(f"{'方式':<20}{'成功':>8}{'耗时(s)':>10}{'登录/秒':>12}")
+    for name, succeeded, elapsed in results:
+        print(f"{name:<20}{succeeded:>8}{elapsed:>10.2f}{args.logins / elapsed:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
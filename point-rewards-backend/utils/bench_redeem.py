@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+兑换并发压测脚本：对同一个奖品并发发起大量兑换请求，检查是否超卖并统计吞吐量
+使用方法：python utils/bench_redeem.py [--requests 2000] [--concurrency 32] [--stock 500] [--hot]
+                                        [--sqlite-profile on|off|compare]
+默认使用临时 SQLite 数据库，可通过 --database-url 指定其他数据库（会清空其中的表）
+--sqlite-profile compare 在两个新的临时 SQLite 库上分别关闭/开启 SQLite 性能模式各跑一次并对比
+奇数序号的请求与移动端一样以字符串传 prize_id，两种写法须走同一条兑换路径
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='兑换并发压测')
+    parser.add_argument('--requests', type=int, default=2000, help='兑换请求总数')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发线程数')
+    parser.add_argument('--stock', type=int, default=500, help='奖品初始库存')
+    parser.add_argument('--users', type=int, default=200, help='参与兑换的用户数')
+    parser.add_argument('--hot', action='store_true', help='把压测奖品设为热门奖品，走内存库存预占')
+    parser.add_argument('--database-url', default=None, help='数据库连接串，默认使用临时 SQLite 文件')
+    parser.add_argument('--sqlite-profile', choices=('on', 'off', 'compare'), default='on',
+                        help='SQLite 性能模式（WAL、busy_timeout 等）：开启、关闭或两者对比')
+    args = parser.parse_args()
+    if args.sqlite_profile == 'compare' and args.database_url:
+        parser.error("--sqlite-profile compare 只能使用临时 SQLite 数据库")
+    return args
+
+
+def build_app(database_url, sqlite_profile=True):
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLITE_PERFORMANCE_MODE = sqlite_profile
+
+    return create_app(BenchConfig)
+
+
+def seed(app, args):
+    """创建一个热门奖品和一批积分充足的用户，返回 (奖品ID, 用户ID列表)"""
+    from app import db
+    from app.models import User, Prize
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        prize = Prize(name='压测奖品', points=Decimal('1.00'), stock=args.stock)
+        db.session.add(prize)
+        users = []
+        for i in range(args.users):
+            user = User(nickname=f'bench{i}', kuaishouId=f'bench{i}', phone=f'bench{i}',
+                        points=Decimal(args.requests), addresses=[])
+            user.set_password('bench')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        return prize.id, [u.id for u in users]
+
+
+def run(app, prize_id, user_ids, args):
+    """并发发起兑换请求，返回各状态码的计数与耗时"""
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        tokens = [create_access_token(identity=str(uid)) for uid in user_ids]
+
+    client = app.test_client()
+
+    def redeem_once(i):
+        response = client.post(
+            '/api/redemptions/redeem',
+            json={'prize_id': str(prize_id) if i % 2 else prize_id, 'shipping_address': 'bench'},
+            headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}'}
+        )
+        return response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        codes = list(pool.map(redeem_once, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    counts = {}
+    for code in codes:
+        counts[code] = counts.get(code, 0) + 1
+    return counts, elapsed
+
+
+def verify(app, prize_id, args):
+    """检查库存、兑换记录与积分是否一致"""
+    from app import db
+    from app.models import User, Prize, Redemption
+
+    with app.app_context():
+        stock = db.session.query(Prize.stock).filter_by(id=prize_id).scalar()
+        redeemed = Redemption.query.filter_by(prize_id=prize_id).count()
+        negative = User.query.filter(User.points < 0).count()
+    return stock, redeemed, negative
+
+
+def bench(args, database_url, sqlite_profile):
+    """建库、压测并校验，返回 (状态码分布, 耗时, 是否一致)"""
+    app = build_app(database_url, sqlite_profile)
+    prize_id, user_ids = seed(app, args)
+
+    from app.stock_reservation import stock_reservations
+    if args.hot:
+        stock_reservations.hot_prize_ids.add(prize_id)
+
+    counts, elapsed = run(app, prize_id, user_ids, args)
+
+    if args.hot:
+        # 回写尚未达到批次上限的兑换记录
+        with app.app_context():
+            stock_reservations.flush(prize_id)
+        stock_reservations.hot_prize_ids.discard(prize_id)
+    stock, redeemed, negative = verify(app, prize_id, args)
+
+    print(f"数据库: {database_url}  SQLite 性能模式: {'开' if sqlite_profile else '关'}")
+    print(f"请求数: {args.requests}  并发: {args.concurrency}  初始库存: {args.stock}  热门奖品: {args.hot}")
+    print(f"状态码分布: {counts}")
+    print(f"耗时: {elapsed:.2f}s  吞吐量: {args.requests / elapsed:.1f} req/s")
+    print(f"剩余库存: {stock}  兑换记录: {redeemed}  负积分用户: {negative}")
+
+    oversold = stock < 0 or redeemed + stock != args.stock or redeemed != counts.get(200, 0)
+    consistent = not oversold and not negative
+    print("✅ 无超卖，库存与兑换记录一致" if consistent else "❌ 检测到超卖或积分异常")
+    return counts, elapsed, consistent
+
+
+def temp_sqlite_url():
+    return 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+
+def main():
+    args = parse_args()
+
+    if args.sqlite_profile == 'compare':
+        results = []
+        for sqlite_profile in (False, True):
+            results.append((sqlite_profile,) + bench(args, temp_sqlite_url(), sqlite_profile))
+            print()
+        print(f"{'SQLite 性能模式':<16}{'成功':>8}{'锁冲突(5xx)':>14}{'req/s':>10}")
+        for sqlite_profile, counts, elapsed, _ in results:
+            server_errors = sum(n for code, n in counts.items() if code >= 500)
+            print(f"{'开' if sqlite_profile else '关':<16}{counts.get(200, 0):>8}{server_errors:>14}"
+                  f"{args.requests / elapsed:>10.1f}")
+        if not all(consistent for *_, consistent in results):
+            sys.exit(1)
+        return
+
+    database_url = args.database_url or temp_sqlite_url()
+    _, _, consistent = bench(args, database_url, args.sqlite_profile == 'on')
+    if not consistent:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
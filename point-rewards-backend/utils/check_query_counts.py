@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQL 语句数量回归检查：兑换记录列表接口的查询数不能随记录数增长（N+1）
+使用方法：python utils/check_query_counts.py [--redemptions 50]
+超出预算时以非零状态码退出，可直接放进部署前检查
+"""
+import argparse
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# 接口 -> 允许的最大 SQL 语句数（含管理员权限校验）
+QUERY_BUDGETS = {
+    '/api/redemptions/history': 2,
+    '/api/admin/redemptions': 3,
+}
+
+
+def build_app():
+    from config import Config
+    from app import create_app
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'check.db')
+
+    return create_app(CheckConfig)
+
+
+def seed(app, count):
+    """创建管理员、普通用户、若干奖品和 count 条兑换记录，返回 (管理员ID, 用户ID)"""
+    from app import db
+    from app.models import User, Prize, Redemption
+
+    with app.app_context():
+        db.create_all()
+        admin = User(nickname='admin', kuaishouId='admin', phone='admin', is_admin=True, addresses=[])
+        user = User(nickname='user', kuaishouId='user', phone='user', addresses=[])
+        admin.set_password('admin')
+        user.set_password('user')
+        prizes = [Prize(name=f'奖品{i}', points=Decimal('1.00'), stock=100) for i in range(10)]
+        db.session.add_all([admin, user, *prizes])
+        db.session.flush()
+        db.session.add_all([
+            Redemption(user_id=user.id, prize_id=prizes[i % len(prizes)].id, points_spent=Decimal('1.00'))
+            for i in range(count)
+        ])
+        db.session.commit()
+        return admin.id, user.id
+
+
+def count_queries(app, url, user_id):
+    """请求 url 并返回 (状态码, 执行的 SQL 语句数)"""
+    from sqlalchemy import event
+    from flask_jwt_extended import create_access_token
+    from app import db
+
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+        engine = db.engine
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = app.test_client().get(url, headers={'Authorization': f'Bearer {token}'})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return response.status_code, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='兑换记录列表 SQL 语句数量检查')
+    parser.add_argument('--redemptions', type=int, default=50, help='预置的兑换记录数')
+    args = parser.parse_args()
+
+    app = build_app()
+    admin_id, user_id = seed(app, args.redemptions)
+
+    failed = False
+    for url, budget in QUERY_BUDGETS.items():
+        caller = admin_id if url.startswith('/api/admin') else user_id
+        status, queries = count_queries(app, url, caller)
+        ok = status == 200 and queries <= budget
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {url}: 状态码 {status}，SQL 语句 {queries} 条（上限 {budget}）")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
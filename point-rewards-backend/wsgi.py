@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+生产环境入口：gunicorn -c gunicorn.conf.py wsgi:app
+本地开发仍可使用 python run.py
+"""
+from app import create_app
+
+app = create_app()
@@ -10,11 +10,20 @@ import { useToast } from '@/hooks/use-toast';
 import { formatPoints, canAfford } from '@/lib/utils';
 import redEnvelopeImage from '@/assets/red-envelope.png';
 
+interface ImageVariant {
+  webp: string;
+  jpeg: string;
+}
+
 interface Prize {
   id: string;
   name: string;
   points: number;
   image: string;
+  image_variants?: {
+    thumb: ImageVariant;
+    detail: ImageVariant;
+  } | null;
   category: string;
   stock: number;
   description: string;
@@ -68,7 +77,17 @@ const PrizeCatalog = ({ userPoints, userAddresses, onRedeem }: PrizeCatalogProps
           ...prize,
           id: prize.id.toString(),
           // 统一处理图片URL
-          image: processImageUrl(prize.image)
+          image: processImageUrl(prize.image),
+          image_variants: prize.image_variants && {
+            thumb: {
+              webp: processImageUrl(prize.image_variants.thumb.webp),
+              jpeg: processImageUrl(prize.image_variants.thumb.jpeg)
+            },
+            detail: {
+              webp: processImageUrl(prize.image_variants.detail.webp),
+              jpeg: processImageUrl(prize.image_variants.detail.jpeg)
+            }
+          }
         }));
         setPrizes(processedPrizes);
       } else {
@@ -169,17 +188,23 @@ const PrizeCatalog = ({ userPoints, userAddresses, onRedeem }: PrizeCatalogProps
               <Card key={prize.id} className="bg-gradient-card shadow-soft hover:shadow-medium transition-all duration-300 animate-fade-in">
                 <CardContent className="p-4">
                   <div className="aspect-[3/4] mb-3 relative overflow-hidden rounded-lg">
-                    <img
-                      src={prize.image}
-                      alt={prize.name}
-                      className="w-full h-full object-cover"
-                      onError={(e) => {
-                        // 图片加载失败时使用默认图片
-                        const target = e.target as HTMLImageElement;
-                        target.src = redEnvelopeImage;
-                      }}
-                      loading="lazy"
-                    />
+                    {/* 有缩略图时优先加载 WebP，不支持的浏览器回退到 JPEG */}
+                    <picture>
+                      {prize.image_variants && (
+                        <source srcSet={prize.image_variants.thumb.webp} type="image/webp" />
+                      )}
+                      <img
+                        src={prize.image_variants ? prize.image_variants.thumb.jpeg : prize.image}
+                        alt={prize.name}
+                        className="w-full h-full object-cover"
+                        onError={(e) => {
+                          // 图片加载失败时使用默认图片
+                          const target = e.target as HTMLImageElement;
+                          target.src = redEnvelopeImage;
+                        }}
+                        loading="lazy"
+                      />
+                    </picture>
                     {prize.stock <= 5 && (
                       <Badge variant="destructive" className="absolute top-2 right-2 text-xs">
                         仅剩{prize.stock}个
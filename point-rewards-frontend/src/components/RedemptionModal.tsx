@@ -17,6 +17,9 @@ interface Prize {
   name: string;
   points: number;
   image: string;
+  image_variants?: {
+    thumb: { webp: string; jpeg: string };
+  } | null;
   category: string;
   stock: number;
   description: string;
@@ -99,11 +102,16 @@ const RedemptionModal = ({ prize, userPoints, userAddresses, isOpen, onClose, on
           ) : (
             <div className="text-center">
               <div className="w-32 h-40 mx-auto mb-4 rounded-lg overflow-hidden">
-                <img
-                  src={prize.image}
-                  alt={prize.name}
-                  className="w-full h-full object-cover"
-                />
+                <picture>
+                  {prize.image_variants && (
+                    <source srcSet={prize.image_variants.thumb.webp} type="image/webp" />
+                  )}
+                  <img
+                    src={prize.image_variants ? prize.image_variants.thumb.jpeg : prize.image}
+                    alt={prize.name}
+                    className="w-full h-full object-cover"
+                  />
+                </picture>
               </div>
               
               <h3 className="text-lg font-semibold mb-2">{prize.name}</h3>